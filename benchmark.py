@@ -0,0 +1,336 @@
+"""
+Performance benchmark suite for the FFT steganography engine.
+
+Measures embed and extract throughput (cover samples/s and payload bits/s)
+and peak traced memory. Each sweep varies one setting around the default
+configuration: cover duration, frame_size, freq_range width, message
+length, streaming mode, float64/float32 precision. A separate micro-benchmark times manual_fft/manual_rfft against
+numpy.fft as a reference. Results are saved as JSON baselines, and
+`compare` flags any metric that regressed by more than a threshold.
+`imports` checks that the headless entry points start within an
+import-time budget and without pulling in SciPy, matplotlib or PyQt5.
+
+Examples:
+    python benchmark.py run --output baseline.json
+    python benchmark.py run --quick --compare baseline.json --threshold 0.15
+    python benchmark.py compare baseline.json current.json
+    python benchmark.py imports --budget 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import wav_stream
+from steganography import FFTSteganography, manual_fft, manual_rfft
+
+
+SAMPLE_RATE = 44100
+
+DEFAULTS = {"duration": 10, "frame_size": 1024, "width": 200, "msg_len": 256, "mode": "memory",
+            "precision": "float64"}
+
+SWEEPS = {
+    "duration": [1, 10, 60, 600, 3600],
+    "frame_size": [256, 512, 1024, 2048, 4096],
+    "width": [50, 100, 200, 400],
+    "msg_len": [16, 256, 1024, 8192],
+    "mode": ["memory", "streaming"],
+    "precision": ["float64", "float32"],
+}
+
+# Sweeps are trimmed to this cover length with --quick
+QUICK_MAX_DURATION = 60
+
+# Metrics where a higher value is better; everything else (peak memory)
+# regresses when it grows
+HIGHER_IS_BETTER = ("samples_per_s", "bits_per_s")
+
+
+# ── Covers and cases ─────────────────────────────────────────────────────────
+
+def make_cover(path, duration, seed=0):
+    """Write a white-noise 16-bit mono cover, block by block so even the
+    hour-long cover never sits in memory."""
+    rng = np.random.default_rng(seed)
+    remaining = int(duration * SAMPLE_RATE)
+    with wav_stream.WavWriter(path, SAMPLE_RATE, 1, np.int16) as out:
+        while remaining:
+            n = min(remaining, SAMPLE_RATE * 60)
+            out.write((rng.uniform(-0.5, 0.5, n) * 32767).astype(np.int16))
+            remaining -= n
+
+
+def case_settings(sweep, value):
+    settings = dict(DEFAULTS, **{sweep: value})
+    frame_size = settings["frame_size"]
+    # Keep the band at the same relative position for every frame size
+    lo = frame_size * 100 // 1024
+    hi = min(lo + settings["width"] * frame_size // 1024, frame_size // 2 + 1)
+    settings["freq_range"] = (lo, hi)
+    return settings
+
+
+def case_id(settings):
+    return ("duration={duration}/frame_size={frame_size}/width={width}/msg_len={msg_len}/mode={mode}"
+            "/precision={precision}").format(**settings)
+
+
+def timed(fn, repeats):
+    """Best wall time over repeats, and the peak traced allocation of the
+    first run (numpy buffers are traced; memory-mapped pages are not)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    best = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def run_case(settings, cover, workdir, repeats):
+    engine = FFTSteganography(
+        frame_size=settings["frame_size"],
+        freq_range=settings["freq_range"],
+        chunk_frames=256 if settings["mode"] == "streaming" else None,
+        precision=settings["precision"])
+    message = "x" * settings["msg_len"]
+    stego = os.path.join(workdir, "stego.wav")
+    n_samples = int(settings["duration"] * SAMPLE_RATE)
+    n_bits = len(message) * 8
+
+    capacity = (n_samples // engine.frame_size) * engine.bits_per_frame
+    if len(engine._payload_bits(message)) > capacity:
+        return {"skipped": f"message needs more than the {capacity}-bit capacity"}
+
+    embed_s, embed_peak = timed(lambda: engine.embed(cover, message, stego), repeats)
+    extract_s, extract_peak = timed(lambda: engine.extract(stego), repeats)
+    return {
+        "embed_samples_per_s": n_samples / embed_s,
+        "embed_bits_per_s": n_bits / embed_s,
+        "embed_peak_mb": embed_peak / 2**20,
+        "extract_samples_per_s": n_samples / extract_s,
+        "extract_bits_per_s": n_bits / extract_s,
+        "extract_peak_mb": extract_peak / 2**20,
+    }
+
+
+def run_fft_reference(repeats, frame_sizes=(256, 1024, 4096), n_frames=256):
+    """manual_fft / manual_rfft against numpy.fft on a batch of frames."""
+    results = {}
+    rng = np.random.default_rng(0)
+    for n in frame_sizes:
+        frames = rng.standard_normal((n_frames, n))
+        for name, ours, ref in (("fft", manual_fft, np.fft.fft), ("rfft", manual_rfft, np.fft.rfft)):
+            ours_s, _ = timed(lambda: ours(frames), repeats)
+            ref_s, _ = timed(lambda: ref(frames), repeats)
+            results[f"{name}/frame_size={n}"] = {
+                "manual_samples_per_s": frames.size / ours_s,
+                "numpy_samples_per_s": frames.size / ref_s,
+                "numpy_speedup": ours_s / ref_s,
+                "max_abs_error": float(np.max(np.abs(ours(frames) - ref(frames)))),
+            }
+    return results
+
+
+def run_suite(quick=False, repeats=3, log=sys.stderr):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        covers = {}
+        for sweep, values in SWEEPS.items():
+            for value in values:
+                settings = case_settings(sweep, value)
+                if quick and settings["duration"] > QUICK_MAX_DURATION:
+                    continue
+                key = case_id(settings)
+                if key in results:
+                    continue
+
+                duration = settings["duration"]
+                if duration not in covers:
+                    covers[duration] = os.path.join(workdir, f"cover_{duration}s.wav")
+                    make_cover(covers[duration], duration)
+
+                results[key] = run_case(settings, covers[duration], workdir, repeats)
+                print(f"{key}: {results[key]}", file=log)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "quick": quick,
+            "repeats": repeats,
+        },
+        "cases": results,
+        "fft_reference": run_fft_reference(repeats),
+    }
+
+
+# ── Import-time budget ───────────────────────────────────────────────────────
+
+# Headless entry points and the code that starts each one. main.py is run
+# with a subcommand (as `python main.py capacity ...` would), not just
+# imported, so the path through cli is what gets measured
+HEADLESS_ENTRY_POINTS = {
+    "steganography": "import steganography",
+    "wav_stream": "import wav_stream",
+    "cli": "import cli",
+    "main capacity": "import main; main.main(['capacity', '--help'])",
+}
+# Modules none of them may load
+HEAVY_MODULES = ("scipy", "matplotlib", "PyQt5")
+
+# Seconds each headless entry point may take to start (numpy included)
+IMPORT_BUDGET = 0.25
+
+_IMPORT_PROBE = """
+import contextlib, io, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        {code}
+    except SystemExit as e:
+        if e.code:
+            raise
+print(time.perf_counter() - start)
+print(" ".join(sorted({{name.partition(".")[0] for name in sys.modules}} & set({heavy!r}))))
+"""
+
+
+def import_times(entry_points=HEADLESS_ENTRY_POINTS, repeats=5):
+    """Best start-up time of each entry point (name -> code) over repeats,
+    each in a fresh interpreter, the heavy modules it loaded, and the error
+    if it failed."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, code in entry_points.items():
+        result = {"seconds": None, "heavy": [], "error": None}
+        for _ in range(repeats):
+            probe = _IMPORT_PROBE.format(code=code, heavy=HEAVY_MODULES)
+            proc = subprocess.run([sys.executable, "-c", probe], cwd=cwd, capture_output=True, text=True)
+            if proc.returncode:
+                result["error"] = (proc.stderr.strip().splitlines() or [f"exit status {proc.returncode}"])[-1]
+                break
+            out = proc.stdout.splitlines()
+            seconds = float(out[0])
+            result["seconds"] = seconds if result["seconds"] is None else min(result["seconds"], seconds)
+            result["heavy"] = out[1].split() if len(out) > 1 else []
+        results[name] = result
+    return results
+
+
+def check_imports(budget=IMPORT_BUDGET, repeats=5):
+    """Print each headless entry point's start-up time; return 1 if any
+    fails, is over budget or loads a heavy module, else 0."""
+    failures = 0
+    for name, result in import_times(repeats=repeats).items():
+        if result["error"]:
+            failures += 1
+            print(f"  {name:<14} failed: {result['error']}")
+            continue
+        problems = []
+        if result["seconds"] > budget:
+            problems.append(f"over the {budget * 1000:.0f} ms budget")
+        if result["heavy"]:
+            problems.append(f"imports {', '.join(result['heavy'])}")
+        failures += bool(problems)
+        print(f"  {name:<14} {result['seconds'] * 1000:7.1f} ms  {'; '.join(problems) or 'ok'}")
+    return 1 if failures else 0
+
+
+# ── Regression comparison ────────────────────────────────────────────────────
+
+def compare(baseline, current, threshold):
+    """Return a list of (case, metric, baseline, current, change) for every
+    metric that got worse by more than threshold (a fraction)."""
+    regressions = []
+    for section in ("cases", "fft_reference"):
+        for key, base_metrics in baseline.get(section, {}).items():
+            cur_metrics = current.get(section, {}).get(key)
+            if not cur_metrics:
+                continue
+            for metric, base in base_metrics.items():
+                cur = cur_metrics.get(metric)
+                # numpy's own numbers are the reference, not ours to gate on
+                if not isinstance(base, (int, float)) or cur is None or base == 0:
+                    continue
+                if metric.startswith("numpy_") or metric == "max_abs_error":
+                    continue
+                change = (cur - base) / base
+                worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+                if worse > threshold:
+                    regressions.append((f"{section}:{key}", metric, base, cur, change))
+    return regressions
+
+
+def report(regressions, threshold):
+    if not regressions:
+        print(f"No regressions above {threshold:.0%}.")
+        return 0
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}:")
+    for key, metric, base, cur, change in regressions:
+        print(f"  {key}  {metric}: {base:.4g} -> {cur:.4g} ({change:+.1%})")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FFT steganography performance benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmark suite.")
+    run.add_argument("--output", help="Save results as a JSON baseline.")
+    run.add_argument("--quick", action="store_true", help=f"Skip covers longer than {QUICK_MAX_DURATION} s.")
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--compare", metavar="BASELINE", help="Compare against a saved baseline.")
+    run.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (fraction).")
+
+    cmp = sub.add_parser("compare", help="Compare two saved result files.")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (fraction).")
+
+    imports = sub.add_parser("imports", help="Check the headless entry points' import time.")
+    imports.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="Seconds allowed per entry point.")
+    imports.add_argument("--repeats", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "imports":
+        return check_imports(args.budget, args.repeats)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        return report(compare(baseline, current, args.threshold), args.threshold)
+
+    results = run_suite(args.quick, args.repeats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved: {args.output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return report(compare(baseline, results, args.threshold), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Headless batch command-line tool for the FFT steganography engine.
+
+Jobs come either from a manifest (JSON Lines or CSV) or from a directory
+glob, run on a process pool with a configurable concurrency limit, and
+each job's result is written as one JSON line as soon as it finishes. A
+failing job is reported and the batch carries on.
+
+Examples:
+    python cli.py embed --covers "covers/*.wav" --message-file secret.txt --output-dir stego/
+    python cli.py embed --manifest jobs.jsonl --jobs 16 > results.jsonl
+    python cli.py extract --inputs "stego/*.wav" --jobs 8
+    python cli.py capacity --inputs "covers/*.wav" --message-file secret.txt
+    arecord -f S16_LE -r 44100 | python cli.py listen --raw int16
+    python cli.py listen --input growing.wav --follow
+
+Manifest rows for embed need "cover", "output" and one of "message",
+"message_file" (text) or "payload_file" (any file, embedded as binary);
+rows for extract need "input". Binary payloads are extracted into the
+result's "payload_base64". A block-framed payload with damaged blocks is
+reported with status "corrupt", the sequence numbers in "corrupt_blocks"
+and the rest of the payload recovered.
+
+listen decodes a live stream instead: a WAV or raw PCM stream on stdin, or
+a file that is still being written (--follow), printing each message as a
+JSON line the moment its last frame arrives.
+"""
+
+import argparse
+import base64
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import wav_stream
+from steganography import BlockPayload, CorruptBlocksError, FFTSteganography, StageStats
+
+
+# Samples per block when comparing cover and stego for the SNR
+_SNR_BLOCK = 1 << 20
+
+
+# ── Jobs ─────────────────────────────────────────────────────────────────────
+
+def load_manifest(path):
+    """Read job rows from a CSV (by extension) or JSON Lines manifest."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return [dict(row) for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def embed_jobs_from_glob(pattern, output_dir, message=None, message_file=None, payload_file=None):
+    jobs = []
+    for cover in sorted(glob.glob(pattern)):
+        stem = os.path.splitext(os.path.basename(cover))[0]
+        job = {"cover": cover, "output": os.path.join(output_dir, f"{stem}_stego.wav")}
+        if message is not None:
+            job["message"] = message
+        elif message_file is not None:
+            job["message_file"] = message_file
+        else:
+            job["payload_file"] = payload_file
+        jobs.append(job)
+    return jobs
+
+
+def extract_jobs_from_glob(pattern):
+    return [{"input": path} for path in sorted(glob.glob(pattern))]
+
+
+def compute_snr(engine, cover_path, stego_path):
+    """SNR (dB) of the stego file against the cover, compared block by block
+    on the engine's normalized mono signal so memory stays bounded."""
+    _, cover = wav_stream.open_wav(cover_path)
+    _, stego = wav_stream.open_wav(stego_path)
+    n = min(len(cover), len(stego))
+
+    signal_power = 0.0
+    noise_power = 0.0
+    for start in range(0, n, _SNR_BLOCK):
+        original = engine._to_float(cover[start : start + _SNR_BLOCK])
+        noise = original - engine._to_float(stego[start : start + _SNR_BLOCK])
+        signal_power += float(np.dot(original, original))
+        noise_power += float(np.dot(noise, noise))
+
+    if noise_power == 0:
+        return float("inf")
+    return 10 * np.log10(signal_power / noise_power)
+
+
+def run_job(op, job, engine_options):
+    """Run one job and return its result record, including the engine's
+    per-stage timings and counters. Never raises."""
+    result = dict(job, op=op)
+    result.pop("message", None)
+    start = time.perf_counter()
+    stats = StageStats()
+    try:
+        engine = FFTSteganography(**engine_options)
+        if op == "embed":
+            message = read_message(job.get("message"), job.get("message_file"), job.get("payload_file"))
+            os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+            engine.embed(job["cover"], message, job["output"], stats=stats)
+            result["embed_seconds"] = time.perf_counter() - start
+            result["message_chars"] = len(message)
+            result["bits_per_frame"] = engine.bits_per_frame
+            snr = compute_snr(engine, job["cover"], job["output"])
+            # JSON has no infinity; an untouched signal reports null
+            result["snr_db"] = snr if np.isfinite(snr) else None
+        else:
+            try:
+                message = engine.extract(job["input"], stats=stats)
+            except CorruptBlocksError as e:
+                # Report the damage, but keep what the intact blocks hold
+                message = e.result.message
+                result["corrupt_blocks"] = e.result.corrupt
+            result.update(message_fields(message))
+        result["status"] = "corrupt" if "corrupt_blocks" in result else "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    result["stats"] = stats.as_dict()
+    return result
+
+
+def capacity_report(paths, engine_options, message, out):
+    """Write each cover's capacity as one JSON line, read from the WAV
+    headers only, plus whether message fits when one is given. Returns the
+    number of covers that could not be read or are too small."""
+    engine = FFTSteganography(**engine_options)
+    size = None if message is None else engine.message_size(message)
+    failures = 0
+    for path in paths:
+        result = {"input": path}
+        try:
+            capacity = engine.capacity(path)
+            result.update(capacity._asdict())
+            result["bits_per_frame"] = engine.bits_per_frame
+            result["bits_per_second"] = engine.density(capacity.sample_rate)["bits_per_second"]
+            if size is not None:
+                result["message_bytes"] = size
+                result["fits"] = size <= result["max_message_bytes"]
+                failures += not result["fits"]
+            result["status"] = "ok"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+            failures += 1
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return failures
+
+
+def read_message(message=None, message_file=None, payload_file=None):
+    if payload_file:
+        with open(payload_file, "rb") as f:
+            return f.read()
+    if message_file:
+        with open(message_file, encoding="utf-8") as f:
+            return f.read()
+    return message
+
+
+def run_batch(op, jobs, engine_options, concurrency, out):
+    """Run jobs on a pool of `concurrency` processes, writing one JSON line
+    per job to `out` as it completes. Returns the number of failed jobs."""
+    # Only batches need the pool; capacity and listen start without it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    failures = 0
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run_job, op, job, engine_options): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = dict(future.result(), job=futures[future])
+            failures += result["status"] != "ok"
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    return failures
+
+
+# Raw PCM formats for listen --raw: (numpy dtype, sample_bits)
+RAW_FORMATS = {
+    "uint8": ("u1", None),
+    "int16": ("<i2", None),
+    "int24": ("<i4", 24),
+    "int32": ("<i4", None),
+    "float32": ("<f4", None),
+}
+
+
+def message_fields(message):
+    """Result fields for an extracted message: "message" for text,
+    "payload_base64" for binary data."""
+    if isinstance(message, bytes):
+        return {"payload_base64": base64.b64encode(message).decode("ascii")}
+    return {"message": message}
+
+
+def listen(source, engine_options, out, raw_format=None, channels=1, follow=False):
+    """Decode messages from a live stream (path, or "-" for stdin): a WAV
+    stream, or raw PCM in raw_format. One JSON line is written per message
+    as soon as it is complete; a block-framed message with corrupt blocks
+    gets status "corrupt" and listening continues. Returns the number of
+    messages decoded and of those that were corrupt."""
+    engine = FFTSteganography(**engine_options)
+    f = sys.stdin.buffer if source == "-" else open(source, "rb")
+    start = time.perf_counter()
+    count = corrupt = 0
+    try:
+        if raw_format:
+            dtype, sample_bits = RAW_FORMATS[raw_format]
+        else:
+            info = wav_stream.read_stream_info(f)
+            if info.dtype is None:
+                raise ValueError("Unsupported WAV sample format.")
+            dtype, channels, sample_bits = info.dtype, info.channels, info.sample_bits
+        messages = engine.extract_stream(wav_stream.read_chunks(f, follow=follow), dtype, channels, sample_bits)
+        try:
+            for message in messages:
+                count += 1
+                if isinstance(message, BlockPayload):
+                    corrupt += 1
+                    result = dict(message_fields(message.message), status="corrupt", corrupt_blocks=message.corrupt)
+                else:
+                    result = dict(message_fields(message), status="ok")
+                result["seconds"] = time.perf_counter() - start
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+        except KeyboardInterrupt:
+            # The usual way to stop listening to a --follow or stdin stream
+            pass
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+    return count, corrupt
+
+
+# ── Command line ─────────────────────────────────────────────────────────────
+
+def add_engine_arguments(parser):
+    """Engine setting flags, shared by every cli.py subcommand and server.py."""
+    parser.add_argument("--frame-size", type=int, default=1024)
+    parser.add_argument("--freq-range", type=int, nargs=2, default=(100, 300), metavar=("LO", "HI"))
+    parser.add_argument("--step", type=float, default=0.1)
+    parser.add_argument("--band", type=float, nargs=4, action="append", metavar=("LO", "HI", "STEP", "BITS"),
+                        help="Multi-band layout instead of --freq-range/--step; repeat per band. "
+                             "BITS > 1 packs that many bits per bin.")
+    parser.add_argument("--chunk-frames", type=int, help="Streaming mode: frames per chunk.")
+    parser.add_argument("--legacy", action="store_true", help="Write the terminator-delimited format (no header).")
+    parser.add_argument("--block-frames", type=int,
+                        help="Write the block-framed container: blocks of this many frames, each with its own CRC.")
+    parser.add_argument("--multichannel", action="store_true",
+                        help="Embed into every channel and keep the cover's channel count and sample format.")
+    parser.add_argument("--precision", choices=("float64", "float32"), default="float64",
+                        help="float32 halves memory traffic and keeps the cover's sample format.")
+
+
+def engine_options(args):
+    """FFTSteganography keyword arguments from add_engine_arguments() flags."""
+    return {
+        "frame_size": args.frame_size,
+        "freq_range": tuple(args.freq_range),
+        "step": args.step,
+        "header": not args.legacy,
+        "chunk_frames": args.chunk_frames,
+        "multichannel": args.multichannel,
+        "bands": args.band,
+        "precision": args.precision,
+        "block_frames": args.block_frames,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch FFT audio steganography.")
+    sub = parser.add_subparsers(dest="op", required=True)
+
+    embed = sub.add_parser("embed", help="Embed messages into cover WAV files.")
+    source = embed.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="JSON Lines or CSV manifest of (cover, message|message_file|payload_file, output) jobs.")
+    source.add_argument("--covers", help="Glob of cover WAV files.")
+    embed.add_argument("--message", help="Message for every cover (with --covers).")
+    embed.add_argument("--message-file", help="File whose text is embedded into every cover (with --covers).")
+    embed.add_argument("--payload-file", help="File embedded as binary data into every cover (with --covers).")
+    embed.add_argument("--output-dir", default=".", help="Where stego files go (with --covers).")
+
+    extract = sub.add_parser("extract", help="Extract messages from stego WAV files.")
+    source = extract.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="JSON Lines or CSV manifest of (input) jobs.")
+    source.add_argument("--inputs", help="Glob of stego WAV files.")
+
+    capacity = sub.add_parser("capacity", help="Report how much each cover can hold, from its header alone.")
+    capacity.add_argument("--inputs", required=True, help="Glob of cover WAV files.")
+    message = capacity.add_mutually_exclusive_group()
+    message.add_argument("--message", help="Also report whether this message fits.")
+    message.add_argument("--message-file", help="Also report whether this file's text fits.")
+    message.add_argument("--payload-file", help="Also report whether this file, as binary data, fits.")
+
+    listen = sub.add_parser("listen", help="Decode messages from live PCM on stdin or a growing file.")
+    listen.add_argument("--input", default="-", help="WAV or raw PCM stream (default: stdin).")
+    listen.add_argument("--follow", action="store_true",
+                        help="Keep reading at end of file, for a file that is still being written.")
+    listen.add_argument("--raw", dest="raw_format", choices=RAW_FORMATS, metavar="FORMAT",
+                        help=f"Headerless PCM in this format ({', '.join(RAW_FORMATS)}).")
+    listen.add_argument("--channels", type=int, default=1, help="Interleaved channels of --raw PCM.")
+
+    for p in (embed, extract):
+        p.add_argument("--jobs", type=int, default=os.cpu_count(), help="Concurrent jobs (default: CPU count).")
+
+    for p in (embed, extract, capacity, listen):
+        p.add_argument("--results", help="Write JSON Lines results here instead of stdout.")
+        add_engine_arguments(p)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.op == "listen":
+        jobs = []
+    elif args.op == "capacity":
+        jobs = extract_jobs_from_glob(args.inputs)
+    elif args.manifest:
+        jobs = load_manifest(args.manifest)
+    elif args.op == "embed":
+        if args.message is None and args.message_file is None and args.payload_file is None:
+            sys.exit("cli.py embed: --covers needs --message, --message-file or --payload-file")
+        jobs = embed_jobs_from_glob(args.covers, args.output_dir, args.message, args.message_file, args.payload_file)
+    else:
+        jobs = extract_jobs_from_glob(args.inputs)
+
+    options = engine_options(args)
+
+    out = open(args.results, "w", encoding="utf-8") if args.results else sys.stdout
+    try:
+        if args.op == "listen":
+            count, corrupt = listen(args.input, options, out, args.raw_format, args.channels, args.follow)
+            print(f"{count} message(s) decoded, {corrupt} corrupt.", file=sys.stderr)
+            return 1 if corrupt else 0
+        if args.op == "capacity":
+            message = read_message(args.message, args.message_file, args.payload_file)
+            failures = capacity_report([job["input"] for job in jobs], options, message, out)
+        else:
+            failures = run_batch(args.op, jobs, options, max(args.jobs, 1), out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"{len(jobs) - failures}/{len(jobs)} jobs succeeded.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,12 @@ Computes SNR, MSE, and extraction accuracy across different test scenarios.
 Generates tables and charts for the report.
 """
 
+import io
 import numpy as np
-from scipy.io import wavfile
-from steganography import FFTSteganography
+from concurrent.futures import ProcessPoolExecutor
+import wav_stream
+from steganography import FFTSteganography, SpectrumCache
 import os
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
 
 
 # ── Metrics ──────────────────────────────────────────────────────────────────
@@ -67,70 +66,89 @@ AUDIO_TYPES = {
     "White Noise":  generate_noise,
 }
 
+# QIM step values to sweep; the charts use the first one
+STEPS = [0.1]
 
-# ── Run Evaluation ───────────────────────────────────────────────────────────
 
-def run_evaluation():
-    engine = FFTSteganography()
-    results = []
+# ── Run Evaluation ───────────────────────────────────────────────────────────
 
-    temp_input = "_eval_input.wav"
-    temp_stego = "_eval_stego.wav"
+# Cover WAV bytes per audio type, handed to each worker process once
+_covers = {}
+
+# Per-process spectrum cache: every cell after the first on a cover skips
+# its forward FFT
+_spectra = SpectrumCache()
+
+
+def _init_worker(covers):
+    _covers.update(covers)
+
+
+def to_wav_bytes(sr, data):
+    buf = io.BytesIO()
+    with wav_stream.WavWriter(buf, sr, 1, data.dtype) as out:
+        out.write(data)
+    return buf.getvalue()
+
+
+def evaluate_cell(audio_name, msg_name, message, step):
+    """Embed, measure and extract one (cover, message, step) cell, entirely
+    on in-memory WAV buffers."""
+    cover = _covers[audio_name]
+    result = {"audio": audio_name, "message": msg_name, "msg_len": len(message), "step": step}
+    try:
+        engine = FFTSteganography(step=step, spectrum_cache=_spectra)
+        stego = io.BytesIO()
+        engine.embed(io.BytesIO(cover), message, stego)
+
+        _, original_data = wav_stream.open_wav(cover)
+        _, stego_data = wav_stream.open_wav(stego.getvalue())
+
+        # Ensure same length
+        min_len = min(len(original_data), len(stego_data))
+        orig_trimmed = original_data[:min_len]
+        steg_trimmed = stego_data[:min_len]
+
+        # Test extraction accuracy
+        accurate = engine.extract(io.BytesIO(stego.getvalue())) == message
+        result.update({
+            "snr": compute_snr(orig_trimmed, steg_trimmed),
+            "mse": compute_mse(orig_trimmed, steg_trimmed),
+            "accuracy": 100.0 if accurate else 0.0,
+            "match": accurate,
+        })
+    except Exception as e:
+        result.update({"snr": 0, "mse": 0, "accuracy": 0, "match": False, "error": str(e)})
+    return result
+
+
+def run_evaluation(steps=STEPS, workers=None):
+    """Evaluate every (audio type, message, step) cell on a process pool.
+    Each cover is generated once and shared by all of its cells."""
+    covers = {name: to_wav_bytes(*audio_gen()) for name, audio_gen in AUDIO_TYPES.items()}
+    cells = [(audio_name, msg_name, message, step)
+             for audio_name in AUDIO_TYPES
+             for msg_name, message in MESSAGES.items()
+             for step in steps]
 
     print("=" * 80)
     print("AUDIO STEGANOGRAPHY — EVALUATION RESULTS")
     print("=" * 80)
     print()
 
-    for audio_name, audio_gen in AUDIO_TYPES.items():
-        for msg_name, message in MESSAGES.items():
-            sr, original_data = audio_gen()
-            wavfile.write(temp_input, sr, original_data)
-
-            try:
-                engine.embed(temp_input, message, temp_stego)
-                _, stego_data = wavfile.read(temp_stego)
-
-                # Ensure same length
-                min_len = min(len(original_data), len(stego_data))
-                orig_trimmed = original_data[:min_len]
-                steg_trimmed = stego_data[:min_len]
-
-                snr = compute_snr(orig_trimmed, steg_trimmed)
-                mse = compute_mse(orig_trimmed, steg_trimmed)
-
-                # Test extraction accuracy
-                extracted = engine.extract(temp_stego)
-                accurate = extracted == message
-                accuracy = 100.0 if accurate else 0.0
-
-                results.append({
-                    "audio": audio_name,
-                    "message": msg_name,
-                    "msg_len": len(message),
-                    "snr": snr,
-                    "mse": mse,
-                    "accuracy": accuracy,
-                    "match": accurate,
-                })
-
-                print(f"[{audio_name}] [{msg_name}]")
-                print(f"  SNR = {snr:.2f} dB | MSE = {mse:.4f} | Accuracy = {accuracy:.0f}%")
-                print()
-
-            except Exception as e:
-                print(f"[{audio_name}] [{msg_name}] ERROR: {e}")
-                results.append({
-                    "audio": audio_name,
-                    "message": msg_name,
-                    "msg_len": len(message),
-                    "snr": 0, "mse": 0, "accuracy": 0, "match": False,
-                })
-
-    # Cleanup temp files
-    for f in [temp_input, temp_stego]:
-        if os.path.exists(f):
-            os.remove(f)
+    # One task per cover, so all of its cells share a worker's spectrum cache
+    per_cover = len(cells) // len(AUDIO_TYPES)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(covers,)) as pool:
+        results = list(pool.map(evaluate_cell, *zip(*cells), chunksize=per_cover))
+
+    for r in results:
+        label = f"[{r['audio']}] [{r['message']}]" + (f" [step={r['step']}]" if len(steps) > 1 else "")
+        if "error" in r:
+            print(f"{label} ERROR: {r['error']}")
+        else:
+            print(label)
+            print(f"  SNR = {r['snr']:.2f} dB | MSE = {r['mse']:.4f} | Accuracy = {r['accuracy']:.0f}%")
+            print()
 
     return results
 
@@ -138,6 +156,13 @@ def run_evaluation():
 # ── Generate Charts ──────────────────────────────────────────────────────────
 
 def generate_charts(results):
+    # Only charting needs matplotlib
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+
+    # One chart set per step value; chart the first one swept
+    results = [r for r in results if r["step"] == results[0]["step"]]
     output_dir = "e:/audiosteg/evaluation_results"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -1,20 +1,53 @@
 import sys
 import os
+import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QTextEdit, QLabel, QFileDialog, QMessageBox, QFrame, QStackedWidget)
-from PyQt5.QtCore import Qt, QUrl
+                             QPushButton, QTextEdit, QLabel, QFileDialog, QMessageBox, QFrame, QStackedWidget,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, QUrl, QThread, pyqtSignal
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from scipy.io import wavfile
-from steganography import FFTSteganography
+from steganography import FFTSteganography, OperationCancelled
+
+
+class StegoWorker(QThread):
+    """Runs an engine embed/extract call off the GUI thread.
+    The engine reports progress between frame chunks; those reports are
+    forwarded as signals, which Qt delivers on the GUI thread."""
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, operation, *args):
+        super().__init__()
+        self.operation = operation
+        self.args = args
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self.operation(*self.args, progress=self.progress.emit, cancel=self.cancel_event)
+        except OperationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.stego_engine = FFTSteganography()
         self.loaded_audio_path = None
+        self.cover_capacity = None
         self.stego_audio_path = None
         self.player = QMediaPlayer()
         self.active_play_btn = None
+        self.worker = None
         
         self.initUI()
 
@@ -104,13 +137,19 @@ class MainWindow(QMainWindow):
         layout.addWidget(QLabel("Secret Message:"))
         self.message_input = QTextEdit()
         self.message_input.setPlaceholderText("Enter the message you want to hide...")
+        self.message_input.textChanged.connect(self.update_capacity)
         layout.addWidget(self.message_input)
 
+        self.capacity_label = QLabel("")
+        layout.addWidget(self.capacity_label)
+
         # Action Button
         self.embed_btn = QPushButton("Run Embedding")
         self.embed_btn.clicked.connect(self.embed_message)
         layout.addWidget(self.embed_btn)
 
+        self.embed_progress, self.embed_cancel_btn = self.create_progress_row(layout)
+
         return widget
 
     def create_extract_screen(self):
@@ -158,8 +197,26 @@ class MainWindow(QMainWindow):
         self.extract_btn.clicked.connect(self.extract_message)
         layout.addWidget(self.extract_btn)
 
+        self.extract_progress, self.extract_cancel_btn = self.create_progress_row(layout)
+
         return widget
 
+    def create_progress_row(self, layout):
+        row = QHBoxLayout()
+        progress = QProgressBar()
+        progress.setFormat("%p% of frames")
+        row.addWidget(progress)
+
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setObjectName("BackBtn")
+        cancel_btn.clicked.connect(self.cancel_operation)
+        row.addWidget(cancel_btn)
+        layout.addLayout(row)
+
+        progress.hide()
+        cancel_btn.hide()
+        return progress, cancel_btn
+
     def show_embed_screen(self):
         self.stack.setCurrentWidget(self.embed_screen)
 
@@ -174,7 +231,8 @@ class MainWindow(QMainWindow):
         path, _ = QFileDialog.getOpenFileName(self, "Open Audio File", "", "WAV Files (*.wav)")
         if path:
             self.loaded_audio_path = path
-            self.update_audio_info(path, self.embed_info_label)
+            self.cover_capacity = self.update_audio_info(path, self.embed_info_label)
+            self.update_capacity()
             self.play_load_btn.setEnabled(True)
 
     def load_stego(self):
@@ -185,13 +243,29 @@ class MainWindow(QMainWindow):
             self.play_stego_btn.setEnabled(True)
 
     def update_audio_info(self, path, label):
+        """Show a file's format, read from its header alone, and return its
+        Capacity (None if it could not be read)."""
         try:
-            sample_rate, data = wavfile.read(path)
-            duration = len(data) / sample_rate
-            info = f"File: {os.path.basename(path)} | {sample_rate}Hz | {duration:.2f}s"
-            label.setText(info)
+            capacity = self.stego_engine.capacity(path)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not read audio file: {e}")
+            return None
+        info = f"File: {os.path.basename(path)} | {capacity.sample_rate}Hz | {capacity.duration:.2f}s"
+        label.setText(info)
+        return capacity
+
+    def message_fits(self, message):
+        return self.stego_engine.message_size(message) <= self.cover_capacity.max_message_bytes
+
+    def update_capacity(self):
+        """Live used/available payload bytes for the loaded cover."""
+        if self.cover_capacity is None:
+            self.capacity_label.setText("")
+            return
+        message = self.message_input.toPlainText()
+        used = self.stego_engine.message_size(message)
+        self.capacity_label.setText(f"Capacity: {used} / {self.cover_capacity.max_message_bytes} bytes")
+        self.capacity_label.setStyleSheet("" if self.message_fits(message) else "color: #e57373;")
 
     def play_audio(self, path, btn):
         if path and os.path.exists(path):
@@ -220,6 +294,45 @@ class MainWindow(QMainWindow):
             else:
                 self.active_play_btn.setText("▶")
 
+    def start_operation(self, operation, args, progress, cancel_btn, action_btn, on_success):
+        """Run operation(*args) on a StegoWorker, driving the given progress
+        bar and cancel button until it finishes."""
+        worker = self.worker = StegoWorker(operation, *args)
+
+        def update_progress(done, total):
+            progress.setMaximum(max(total, 1))
+            progress.setValue(done)
+
+        def finish():
+            progress.hide()
+            cancel_btn.hide()
+            action_btn.setEnabled(True)
+            # finished is emitted while the thread is still winding down: only
+            # let go of it once it has stopped, and leave the deletion to Qt
+            worker.wait()
+            worker.deleteLater()
+            if self.worker is worker:
+                self.worker = None
+
+        self.worker.progress.connect(update_progress)
+        self.worker.succeeded.connect(on_success)
+        self.worker.failed.connect(lambda error: QMessageBox.critical(self, "Error", error))
+        self.worker.cancelled.connect(lambda: QMessageBox.information(self, "Cancelled", "Operation cancelled."))
+        self.worker.finished.connect(finish)
+
+        action_btn.setEnabled(False)
+        progress.setValue(0)
+        progress.show()
+        cancel_btn.setEnabled(True)
+        cancel_btn.show()
+        self.worker.start()
+
+    def cancel_operation(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.embed_cancel_btn.setEnabled(False)
+            self.extract_cancel_btn.setEnabled(False)
+
     def embed_message(self):
         if not self.loaded_audio_path:
             QMessageBox.warning(self, "Warning", "Please load an audio file first.")
@@ -229,32 +342,48 @@ class MainWindow(QMainWindow):
         if not message:
             QMessageBox.warning(self, "Warning", "Please enter a message to embed.")
             return
+        if self.cover_capacity is not None and not self.message_fits(message):
+            QMessageBox.warning(self, "Warning",
+                                f"Message too long: {self.stego_engine.message_size(message)} bytes, "
+                                f"this audio holds {self.cover_capacity.max_message_bytes} bytes.")
+            return
 
-        QApplication.processEvents()
+        save_path, _ = QFileDialog.getSaveFileName(self, "Save Stego Audio", "stego_audio.wav", "WAV Files (*.wav)")
+        if not save_path:
+            return
 
-        try:
-            save_path, _ = QFileDialog.getSaveFileName(self, "Save Stego Audio", "stego_audio.wav", "WAV Files (*.wav)")
-            if save_path:
-                self.stego_engine.embed(self.loaded_audio_path, message, save_path)
-                self.message_input.clear()
-                QMessageBox.information(self, "Success", f"Stego audio saved to {save_path}")
-            else:
-                pass
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        def on_success(_):
+            self.message_input.clear()
+            QMessageBox.information(self, "Success", f"Stego audio saved to {save_path}")
+
+        self.start_operation(self.stego_engine.embed, (self.loaded_audio_path, message, save_path),
+                             self.embed_progress, self.embed_cancel_btn, self.embed_btn, on_success)
 
     def extract_message(self):
         if not self.stego_audio_path:
             QMessageBox.warning(self, "Warning", "Please load a stego audio file first.")
             return
 
-        QApplication.processEvents()
-
-        try:
-            extracted_text = self.stego_engine.extract(self.stego_audio_path)
-            self.extracted_text_display.setPlainText(extracted_text)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        def on_success(message):
+            if isinstance(message, str):
+                self.extracted_text_display.setPlainText(message)
+                return
+            # Binary payload: offer to save it rather than display it
+            self.extracted_text_display.setPlainText(f"[{len(message)} bytes of binary data]")
+            save_path, _ = QFileDialog.getSaveFileName(self, "Save Extracted Data", "extracted.bin", "All Files (*)")
+            if save_path:
+                with open(save_path, "wb") as f:
+                    f.write(message)
+
+        self.start_operation(self.stego_engine.extract, (self.stego_audio_path,),
+                             self.extract_progress, self.extract_cancel_btn, self.extract_btn, on_success)
+
+    def closeEvent(self, event):
+        # Stop a running operation before the window (and its engine) goes away
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -1,8 +1,22 @@
+"""
+Entry point. With no arguments, starts the GUI. With a cli.py subcommand
+(embed, extract, capacity, listen), runs it headless instead, without
+importing PyQt5 at all:
+
+    python main.py extract --inputs "stego/*.wav"
+"""
+
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui import MainWindow
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        import cli
+        return cli.main(argv)
+
+    from PyQt5.QtWidgets import QApplication
+    from gui import MainWindow
+
     app = QApplication(sys.argv)
     
     # Optional: Apply some basic styling for better aesthetics
@@ -90,4 +104,4 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
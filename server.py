@@ -0,0 +1,351 @@
+"""
+Local embed/extract service for the FFT steganography engine.
+
+A stdlib asyncio HTTP/1.1 server, on localhost or a Unix socket. Requests
+are handed to a warm pool of worker processes, each with the engine
+constructed and its FFT tables built at startup. Request bodies are
+streamed to a spool file and responses streamed back from one, so a large
+WAV never sits in memory whole. At most --concurrency requests run at
+once and at most --queue-depth wait for a slot; beyond that the server
+answers 503 straight away, before reading the body.
+
+Endpoints (one request per connection):
+    POST /embed?message_length=N[&binary=1]
+         Body: N bytes of message (UTF-8 text, or binary data with
+         binary=1) followed by the cover WAV. Response: the stego WAV.
+    POST /extract      Body: stego WAV. Response: JSON with "message", or
+                       "payload_base64" for a binary payload, plus
+                       "corrupt_blocks" when blocks of a block-framed
+                       payload were damaged.
+    POST /capacity[?message_length=N]
+                       Body: cover WAV (only its header is parsed; the
+                       samples are read past, not stored).
+                       Response: JSON capacity, plus "fits" with N.
+    GET  /status       In-flight and queued request counts.
+
+Examples:
+    python server.py --port 8765 --workers 4 --concurrency 4 --queue-depth 32
+    curl --data-binary @cover.wav "localhost:8765/capacity"
+    python server.py --unix /tmp/stego.sock
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import wav_stream
+from cli import add_engine_arguments, engine_options
+from steganography import CorruptBlocksError, FFTSteganography
+
+
+# Bytes per socket read / write while streaming bodies
+_IO_CHUNK = 1 << 20
+# A WAV header (fmt plus any chunks before data) must arrive within this
+_HEADER_LIMIT = 1 << 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ── Worker processes ─────────────────────────────────────────────────────────
+
+# Each worker's engine, built once by the pool initializer
+_engine = None
+
+
+def _init_worker(engine_options):
+    global _engine
+    _engine = FFTSteganography(**engine_options)
+    _engine.warm_up()
+
+
+def _ready():
+    return os.getpid()
+
+
+def _embed_job(cover_path, message, output_path):
+    _engine.embed(cover_path, message, output_path)
+
+
+def _extract_job(stego_path):
+    return _engine.extract(stego_path)
+
+
+# ── Server ───────────────────────────────────────────────────────────────────
+
+class StegoServer:
+    def __init__(self, engine_options, workers=os.cpu_count(), concurrency=None, queue_depth=16,
+                 max_body=None, spool_dir=None):
+        """
+        :param engine_options: FFTSteganography keyword arguments, shared by
+                               every worker.
+        :param workers: Worker processes in the pool.
+        :param concurrency: Requests processed at once (default: workers).
+        :param queue_depth: Requests allowed to wait for a slot; any more
+                            are refused with 503.
+        :param max_body: Largest accepted request body in bytes (None: any).
+        :param spool_dir: Where request and response bodies are spooled.
+        """
+        self.engine = FFTSteganography(**engine_options)
+        self.engine_options = engine_options
+        self.workers = workers
+        self.concurrency = concurrency or workers
+        self.queue_depth = queue_depth
+        self.max_body = max_body
+        self.spool_dir = spool_dir
+        self.in_flight = 0
+        self.queued = 0
+        self._slots = None
+        self._pool = None
+
+    async def start(self):
+        """Start the pool and wait until every worker is up and warm."""
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.engine_options,))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _ready) for _ in range(self.workers)))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _check_busy(self):
+        """Refuse with 503 when every slot is taken and the queue is full."""
+        if self._slots.locked() and self.queued >= self.queue_depth:
+            raise HTTPError(503, f"Server busy: {self.queued} requests already queued.")
+
+    async def _run(self, fn, *args):
+        """Run fn(*args) on the pool once a slot is free, refusing outright
+        when the queue is already full."""
+        self._check_busy()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    # ── HTTP plumbing ──
+
+    async def handle(self, reader, writer):
+        spooled = []
+        try:
+            try:
+                method, path, headers = await self._read_head(reader)
+                await self._dispatch(method, path, headers, reader, writer, spooled)
+            except HTTPError as e:
+                await self._send_json(writer, {"error": str(e)}, e.status)
+            except ValueError as e:
+                await self._send_json(writer, {"error": str(e)}, 400)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            except Exception as e:
+                await self._send_json(writer, {"error": f"{type(e).__name__}: {e}"}, 500)
+        finally:
+            for path in spooled:
+                if os.path.exists(path):
+                    os.remove(path)
+            writer.close()
+
+    async def _read_head(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line[0], request_line[1], headers
+
+    def _body_length(self, headers):
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length is required.")
+        length = int(headers["content-length"])
+        if self.max_body is not None and length > self.max_body:
+            raise HTTPError(413, f"Body of {length} bytes exceeds the {self.max_body}-byte limit.")
+        return length
+
+    def _spool_path(self, spooled):
+        fd, path = tempfile.mkstemp(suffix=".wav", dir=self.spool_dir)
+        os.close(fd)
+        spooled.append(path)
+        return path
+
+    async def _spool(self, reader, length, spooled):
+        """Stream length bytes of request body into a spool file."""
+        path = self._spool_path(spooled)
+        with open(path, "wb") as f:
+            while length:
+                chunk = await reader.read(min(length, _IO_CHUNK))
+                if not chunk:
+                    raise HTTPError(400, "Request body ended early.")
+                f.write(chunk)
+                length -= len(chunk)
+        return path
+
+    async def _read_wav_info(self, reader, length):
+        """Parse the WAV header at the start of a length-byte body as it
+        arrives, then read and drop the samples: nothing is spooled."""
+        head = bytearray()
+        while True:
+            chunk = await reader.read(min(length - len(head), _IO_CHUNK))
+            if not chunk:
+                raise HTTPError(400, "Request body ended early.")
+            head += chunk
+            try:
+                info = wav_stream.read_wav_info(bytes(head), file_size=length)
+                break
+            except ValueError:
+                # Only the start of the header may have arrived so far
+                if len(head) >= min(length, _HEADER_LIMIT):
+                    raise
+        length -= len(head)
+        while length:
+            chunk = await reader.read(min(length, _IO_CHUNK))
+            if not chunk:
+                raise HTTPError(400, "Request body ended early.")
+            length -= len(chunk)
+        return info
+
+    async def _send(self, writer, status, content_type, length):
+        writer.write((f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                      f"Content-Type: {content_type}\r\n"
+                      f"Content-Length: {length}\r\n"
+                      "Connection: close\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _send_json(self, writer, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, status, "application/json", len(body))
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_file(self, writer, path):
+        """Stream a file back, waiting for the client to keep up."""
+        await self._send(writer, 200, "audio/wav", os.path.getsize(path))
+        with open(path, "rb") as f:
+            while chunk := f.read(_IO_CHUNK):
+                writer.write(chunk)
+                await writer.drain()
+
+    # ── Endpoints ──
+
+    async def _dispatch(self, method, target, headers, reader, writer, spooled):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/status":
+            return await self._send_json(writer, {
+                "in_flight": self.in_flight, "queued": self.queued,
+                "concurrency": self.concurrency, "queue_depth": self.queue_depth})
+        if url.path not in ("/embed", "/extract", "/capacity"):
+            raise HTTPError(404, f"No endpoint {url.path}.")
+        if method != "POST":
+            raise HTTPError(405, f"{url.path} needs POST.")
+
+        length = self._body_length(headers)
+        if url.path != "/capacity":
+            # Refuse before the body is read and spooled, not after
+            self._check_busy()
+        if url.path == "/embed":
+            message_length = int(query.get("message_length", 0))
+            if not 0 < message_length <= length:
+                raise HTTPError(400, "message_length must be between 1 and the body length.")
+            message = await reader.readexactly(message_length)
+            if query.get("binary") != "1":
+                message = message.decode("utf-8")
+            cover = await self._spool(reader, length - message_length, spooled)
+            # Instant rejection, before the request takes a worker slot
+            self.engine.check_capacity(cover, message)
+            stego = self._spool_path(spooled)
+            await self._run(_embed_job, cover, message, stego)
+            return await self._send_file(writer, stego)
+
+        if url.path == "/capacity":
+            result = self.engine.capacity(await self._read_wav_info(reader, length))._asdict()
+            result["density"] = self.engine.density(result["sample_rate"])
+            if "message_length" in query:
+                result["fits"] = int(query["message_length"]) <= result["max_message_bytes"]
+            return await self._send_json(writer, result)
+
+        source = await self._spool(reader, length, spooled)
+        result = {}
+        try:
+            message = await self._run(_extract_job, source)
+        except CorruptBlocksError as e:
+            message = e.result.message
+            result["corrupt_blocks"] = e.result.corrupt
+        if isinstance(message, bytes):
+            result["payload_base64"] = base64.b64encode(message).decode("ascii")
+        else:
+            result["message"] = message
+        return await self._send_json(writer, result)
+
+
+# ── Command line ─────────────────────────────────────────────────────────────
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local FFT steganography service.")
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument("--port", type=int, default=8765, help="TCP port on --host (default: 8765).")
+    listen.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket instead.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count).")
+    parser.add_argument("--concurrency", type=int, help="Requests processed at once (default: --workers).")
+    parser.add_argument("--queue-depth", type=int, default=16, help="Requests allowed to wait; more get 503.")
+    parser.add_argument("--max-body", type=int, help="Largest accepted request body, in bytes.")
+    parser.add_argument("--spool-dir", help="Directory for spooled bodies (default: system temp).")
+    add_engine_arguments(parser)
+    return parser
+
+
+async def serve(args):
+    server = StegoServer(engine_options(args), max(args.workers, 1), args.concurrency, args.queue_depth,
+                         args.max_body, args.spool_dir)
+    await server.start()
+    try:
+        if args.unix:
+            listener = await asyncio.start_unix_server(server.handle, path=args.unix)
+            where = args.unix
+        else:
+            listener = await asyncio.start_server(server.handle, args.host, args.port)
+            where = f"http://{args.host}:{args.port}"
+        print(f"Listening on {where} with {server.workers} warm workers.", file=sys.stderr)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    try:
+        asyncio.run(serve(build_parser().parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,102 @@
+import contextlib
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
 import numpy as np
-from scipy.io import wavfile
+
+import wav_stream
 
 
+# Modules only some code paths need (the worker pool and shared memory,
+# cache-key hashing, JSON stats) are imported where they are used, so that
+# a short headless run pays for numpy and little else at start-up.
+
 # ── Manual FFT / IFFT (Cooley-Tukey radix-2) ────────────────────────────────
 
+_FFT_TABLES = {}
+
+
+def _precision(dtype):
+    """(real, complex) dtypes a transform of dtype input runs in: single
+    precision for float32/complex64 input, double for anything else."""
+    if dtype in (np.float32, np.complex64):
+        return np.dtype(np.float32), np.dtype(np.complex64)
+    return np.dtype(np.float64), np.dtype(np.complex128)
+
+
+def _fft_tables(n, dtype=np.complex128):
+    """Return the (bit-reversal permutation, per-stage twiddles) for size n,
+    with the twiddles in complex dtype dtype.
+    Tables are built once per transform size and precision and cached,
+    since every frame of a file shares the same size.
+    """
+    dtype = np.dtype(dtype)
+    tables = _FFT_TABLES.get((n, dtype))
+    if tables is None:
+        levels = n.bit_length() - 1
+        idx = np.arange(n)
+        rev = np.zeros(n, dtype=np.intp)
+        for b in range(levels):
+            rev |= ((idx >> b) & 1) << (levels - 1 - b)
+
+        # Twiddle factors  W_m^k = e^{-2πjk/m}  for every stage size m = 2, 4, ..., n
+        twiddles = []
+        m = 2
+        while m <= n:
+            # Computed in double precision, then rounded once
+            twiddles.append(np.exp(-2j * np.pi * np.arange(m // 2) / m).astype(dtype))
+            m <<= 1
+
+        tables = (rev, twiddles)
+        _FFT_TABLES[(n, dtype)] = tables
+    return tables
+
+
+def _fft_iterative(x):
+    """Cooley-Tukey radix-2 Decimation-In-Time FFT (iterative, in-place).
+    Transforms along the last axis, so a (num_frames, N) matrix is
+    transformed frame-by-frame in a single pass: every butterfly stage is
+    applied across all frames at once.
+    Input length MUST be a power of 2. complex64 input is transformed in
+    single precision, anything else in double.
+
+    The butterflies are the same ones the recursive formulation performs,
+    in the same order and with the same twiddles, so the output is
+    bit-for-bit identical to it -- just without the per-level slicing,
+    twiddle generation and concatenation.
+    """
+    N = x.shape[-1]
+    if N <= 1 or x.size == 0:
+        return x
+
+    rev, twiddles = _fft_tables(N, _precision(x.dtype)[1])
+    a = np.ascontiguousarray(x[..., rev])
+    lead = a.shape[:-1]
+
+    half = 1
+    for w in twiddles:
+        blocks = a.reshape(lead + (-1, 2 * half))
+        even = blocks[..., :half]
+        odd = blocks[..., half:]
+        T = w * odd
+        np.subtract(even, T, out=odd)
+        even += T
+        half <<= 1
+
+    return a
+
+
 def _fft_recursive(x):
     """Cooley-Tukey radix-2 Decimation-In-Time FFT (recursive).
     Input length MUST be a power of 2.
+
+    Reference implementation; the engine uses _fft_iterative, which
+    tests/test_fft.py checks against this bit for bit.
     """
     N = len(x)
     if N <= 1:
@@ -22,174 +112,1549 @@ def _fft_recursive(x):
     return np.concatenate([even + T, even - T])
 
 
+def _next_pow2(n):
+    n_padded = 1
+    while n_padded < n:
+        n_padded <<= 1
+    return n_padded
+
+
 def manual_fft(x):
     """Compute the DFT of x using the Cooley-Tukey FFT algorithm.
     Automatically zero-pads to the next power of 2.
+    A 2-D input is treated as a batch of frames (one per row).
     """
-    N = len(x)
-    # Pad to next power of 2
-    n_padded = 1
-    while n_padded < N:
-        n_padded <<= 1
+    x = np.asarray(x)
+    N = x.shape[-1]
+    n_padded = _next_pow2(N)
 
-    x_padded = np.zeros(n_padded, dtype=complex)
-    x_padded[:N] = x
-    return _fft_recursive(x_padded)
+    x_padded = np.zeros(x.shape[:-1] + (n_padded,), dtype=complex)
+    x_padded[..., :N] = x
+    return _fft_iterative(x_padded)
 
 
 def manual_ifft(X):
     """Compute the inverse DFT using the FFT via the conjugate method:
        ifft(X) = conj( fft( conj(X) ) ) / N
+    A 2-D input is treated as a batch of spectra (one per row).
     """
-    N = len(X)
+    X = np.asarray(X)
+    N = X.shape[-1]
     # Pad to next power of 2 (should already be, but just in case)
-    n_padded = 1
-    while n_padded < N:
-        n_padded <<= 1
+    n_padded = _next_pow2(N)
+
+    X_padded = np.zeros(X.shape[:-1] + (n_padded,), dtype=complex)
+    X_padded[..., :N] = X
+    return np.conjugate(_fft_iterative(np.conjugate(X_padded))) / n_padded
+
+
+# ── Real-input FFT (Hermitian half-spectrum) ──────────────────────────────────
+
+_RFFT_TWIDDLES = {}
+
+
+def _rfft_twiddles(n, dtype=np.complex128):
+    """W_n^k = e^{-2πjk/n} for k = 0 .. n/2, cached per size and dtype."""
+    dtype = np.dtype(dtype)
+    w = _RFFT_TWIDDLES.get((n, dtype))
+    if w is None:
+        w = np.exp(-2j * np.pi * np.arange(n // 2 + 1) / n).astype(dtype)
+        _RFFT_TWIDDLES[(n, dtype)] = w
+    return w
+
+
+def manual_rfft(x):
+    """DFT of a real signal, returning only the non-negative half-spectrum
+    (N/2 + 1 bins). The N real samples are packed into an N/2-point complex
+    signal z[n] = x[2n] + j*x[2n+1], transformed with the complex FFT, and
+    the even/odd spectra are separated using Hermitian symmetry.
+    Automatically zero-pads to the next power of 2 (at least 2).
+    A 2-D input is treated as a batch of frames (one per row).
+    float32 input is transformed in single precision (complex64 output),
+    anything else in double.
+    """
+    x = np.asarray(x)
+    real, cplx = _precision(x.dtype)
+    x = x.astype(real, copy=False)
+    N = x.shape[-1]
+    n_padded = max(_next_pow2(N), 2)
+    half = n_padded // 2
+
+    if N != n_padded:
+        x_padded = np.zeros(x.shape[:-1] + (n_padded,), dtype=real)
+        x_padded[..., :N] = x
+        x = x_padded
+
+    z = np.empty(x.shape[:-1] + (half,), dtype=cplx)
+    z.real = x[..., 0::2]
+    z.imag = x[..., 1::2]
+    Z = _fft_iterative(z)
+
+    # Z[k] and conj(Z[half - k]) for k = 0 .. half (index half wraps to 0)
+    Zk = np.concatenate([Z, Z[..., :1]], axis=-1)
+    Zr = np.conjugate(Zk[..., ::-1])
+    even = (Zk + Zr) * 0.5
+    odd = (Zk - Zr) * -0.5j
+    return even + _rfft_twiddles(n_padded, cplx) * odd
+
+
+def manual_irfft(X, n=None):
+    """Inverse of manual_rfft: rebuild n real samples from the N/2 + 1
+    half-spectrum bins X (n defaults to 2 * (len(X) - 1)). The imaginary
+    parts of the DC and Nyquist bins are ignored, so the result is the real
+    signal whose spectrum is the Hermitian extension of X.
+    A 2-D input is treated as a batch of spectra (one per row).
+    complex64 input gives float32 output, computed in single precision.
+    n must be a power of 2 (at least 2).
+    """
+    X = np.asarray(X)
+    real, cplx = _precision(X.dtype)
+    if n is None:
+        n = 2 * (X.shape[-1] - 1)
+    if n < 2 or n & (n - 1):
+        raise ValueError(f"manual_irfft needs a power-of-2 length of at least 2, not {n}.")
+    half = n // 2
+
+    Xk = X[..., :half + 1]
+    Xr = np.conjugate(Xk[..., ::-1])
+    even = (Xk + Xr) * 0.5
+    odd = (Xk - Xr) * 0.5 * np.conjugate(_rfft_twiddles(n, cplx))
+    Z = (even + 1j * odd)[..., :half]
+
+    # Inverse complex FFT via the conjugate method
+    z = np.conjugate(_fft_iterative(np.conjugate(Z))) / half
+
+    x = np.empty(X.shape[:-1] + (n,), dtype=real)
+    x[..., 0::2] = z.real
+    x[..., 1::2] = z.imag
+    return x
+
+
+# ── QIM kernels ─────────────────────────────────────────────────────────────
+
+def qim_embed(magnitudes, symbols, step, levels=2):
+    """Quantization Index Modulation on an array of magnitudes.
+    Each magnitude is moved onto a multiple of step whose index is
+    congruent to its symbol modulo levels; with the default two levels
+    that is index parity matching the bit (even = 0, odd = 1). magnitudes
+    and symbols broadcast together, so a whole (frames, bins) block is
+    quantized in one call.
+    """
+    scaled = magnitudes / step
+    q = np.floor(scaled)
+    # Bump up to the next index carrying the symbol, or down to the
+    # previous one where that is nearer and keeps the magnitude >= 0
+    up = (symbols - q) % levels
+    down = (2 * up > levels + 2 * (scaled - q)) & (q + up >= levels)
+    return (q + up - levels * down) * step
+
+
+def qim_extract(magnitudes, step, levels=2):
+    """Recover the symbols (bits, with two levels) carried by an array of
+    QIM-quantized magnitudes."""
+    return (np.round(magnitudes / step) % levels).astype(np.uint8)
+
+
+def _pack_symbols(bits, bits_per_symbol):
+    """(frames, n * bits_per_symbol) bits -> (frames, n) symbols, MSB first."""
+    if bits_per_symbol == 1:
+        return bits
+    weights = 1 << np.arange(bits_per_symbol - 1, -1, -1)
+    return bits.reshape(len(bits), -1, bits_per_symbol) @ weights
+
+
+def _unpack_symbols(symbols, bits_per_symbol):
+    """Inverse of _pack_symbols."""
+    if bits_per_symbol == 1:
+        return symbols
+    shifts = np.arange(bits_per_symbol - 1, -1, -1)
+    return ((symbols[..., None] >> shifts) & 1).astype(np.uint8).reshape(len(symbols), -1)
+
+
+# ── Payload encoding ────────────────────────────────────────────────────────
+
+def bytes_to_bits(data):
+    """Bytes (or any uint8 buffer) -> uint8 array of bits, MSB first."""
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def bits_to_bytes(bits):
+    """uint8 array of bits, MSB first -> bytes. A trailing partial byte is
+    dropped."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    return np.packbits(bits[:len(bits) // 8 * 8]).tobytes()
+
+
+class TerminatorDecoder:
+    """Incremental bits -> bytes decoder for terminator-delimited payloads.
+
+    Each feed() packs only the newly arrived bits (plus at most 7 left over
+    from the previous call) and scans only the new bytes, together with a
+    short tail of the previous ones so a terminator split across two feeds
+    is still found. Total work is linear in the payload length.
+    """
+
+    def __init__(self, terminator):
+        self.terminator = terminator
+        self._pending = np.zeros(0, dtype=np.uint8)
+        self._chunks = []
+        self._length = 0
+        self._tail = b""
+
+    def feed(self, bits):
+        """Consume more bits. Returns the bytes preceding the first
+        terminator once it has been seen, otherwise None."""
+        bits = np.concatenate([self._pending, np.asarray(bits, dtype=np.uint8)])
+        n_bytes = len(bits) // 8
+        self._pending = bits[n_bytes * 8:]
+        if n_bytes == 0:
+            return None
+
+        chunk = bits_to_bytes(bits[:n_bytes * 8])
+        window = self._tail + chunk
+        pos = window.find(self.terminator)
+        window_start = self._length - len(self._tail)
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        if pos != -1:
+            return b"".join(self._chunks)[:window_start + pos]
+
+        keep = len(self.terminator) - 1
+        self._tail = window[-keep:] if keep else b""
+        return None
+
+
+# Frames transformed per batched FFT call while scanning for the terminator
+_EXTRACT_BATCH_FRAMES = 32
+
+# Frames per chunk between progress reports / cancel checks, when hooks are
+# given and no streaming chunk_frames is set
+_PROGRESS_CHUNK_FRAMES = 64
+
+
+class OperationCancelled(Exception):
+    """Raised by embed()/extract() when their cancel event is set."""
+
+
+# ── Instrumentation ─────────────────────────────────────────────────────────
+
+class StageStats:
+    """Wall time per pipeline stage and event counters for one engine call.
+
+    Stages: read, normalize, forward_fft, qim, inverse_fft, quantize,
+    passthrough, write, decode_payload, hash (sharded_transform replaces the
+    transform stages when workers > 1). Counters: frames_processed,
+    bits_embedded, bytes_read, cached_frames. Times accumulate over chunks.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        return {"timings": dict(self.timings), "counters": dict(self.counters)}
+
+    def to_json(self):
+        import json
+        return json.dumps(self.as_dict())
+
+
+class _NullStats:
+    """Stand-in when instrumentation is off: every call is a no-op."""
+    _context = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def count(self, name, n):
+        pass
+
+
+class _Hooks:
+    """One call's progress/cancel hooks and stats collector, threaded through
+    the pipeline."""
+
+    def __init__(self, progress=None, cancel=None, stats=None):
+        self.progress = progress
+        self.cancel = cancel
+        self.stats = stats if stats is not None else _NullStats()
+
+    @property
+    def watched(self):
+        return self.progress is not None or self.cancel is not None
+
+    def tick(self, done, total):
+        """Between chunks: honour a pending cancel request, report progress."""
+        if self.cancel is not None and self.cancel.is_set():
+            raise OperationCancelled()
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def done(self, total):
+        if self.progress is not None:
+            self.progress(total, total)
+
+
+_NO_HOOKS = _Hooks()
+
+# ── Parallel shard workers ──────────────────────────────────────────────────
+
+class _SharedArray:
+    """Attach to a shared-memory block by (name, shape, dtype) spec."""
+
+    @staticmethod
+    def view(shm, spec):
+        _, shape, dtype = spec
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    def __init__(self, spec):
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(name=spec[0])
+        self.array = self.view(self.shm, spec)
+
+    def __enter__(self):
+        return self.array
+
+    def __exit__(self, *exc):
+        # The view must be released before the mapping can be closed
+        self.array = None
+        self.shm.close()
+
+
+def _embed_shard(engine, in_spec, out_spec, start, stop, bits):
+    n0, n1 = start * engine.frame_size, stop * engine.frame_size
+    with _SharedArray(in_spec) as audio, _SharedArray(out_spec) as out:
+        out[n0:n1] = engine._embed_frames(audio[n0:n1], bits)
+
+
+def _decode_shard(engine, in_spec, out_spec, start, stop):
+    n0, n1 = start * engine.frame_size, stop * engine.frame_size
+    bpf = engine.bits_per_frame
+    with _SharedArray(in_spec) as audio, _SharedArray(out_spec) as out:
+        out[start * bpf : stop * bpf] = engine._decode_audio(audio[n0:n1])
+
+
+# ── Spectrum cache ──────────────────────────────────────────────────────────
+
+# Samples hashed per update when keying a cover by its content
+_HASH_BLOCK = 1 << 22
+
+
+class SpectrumCache:
+    """LRU cache of cover spectra (per-frame magnitudes and phases), so that
+    repeated embeds into the same cover skip the forward FFT.
+
+    Entries are keyed by a hash of the cover samples and the transform
+    parameters, and hold the spectra of a prefix of the cover's frames,
+    extended as longer messages need more. The least recently used entries
+    are evicted once the arrays exceed max_bytes. With a directory, entries
+    are also saved there as .npy files and survive eviction and restarts.
+    One cache can be shared by any number of engines and threads.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, directory=None):
+        """
+        :param max_bytes: Memory budget for the cached arrays.
+        :param directory: Optional on-disk store, created if missing.
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _paths(self, key):
+        return [os.path.join(self.directory, f"{key}.{part}.npy") for part in ("mag", "phase")]
+
+    def get(self, key):
+        """(magnitudes, phases) for key, or None. Disk entries are
+        memory-mapped rather than read up front."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.directory is None:
+            return None
+        try:
+            entry = tuple(np.load(path, mmap_mode="r") for path in self._paths(key))
+        except (OSError, ValueError):
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, magnitudes, phases):
+        entry = (magnitudes, phases)
+        self._remember(key, entry)
+        if self.directory is not None:
+            for path, array in zip(self._paths(key), entry):
+                # Write aside and rename, so readers never see a partial file
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp, path)
+
+    def _remember(self, key, entry):
+        size = sum(array.nbytes for array in entry)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= sum(array.nbytes for array in old)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sum(array.nbytes for array in evicted)
+
+    def clear(self):
+        """Drop the in-memory entries (the disk store is left alone)."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# ── Payload header ──────────────────────────────────────────────────────────
+# magic, version, flags, frame_size, freq_range[0], freq_range[1], layout
+# checksum, payload length in bytes. 22 bytes (176 bits), so it fits in the
+# first frame with the default 200-bin band. The checksum is a CRC-32 of
+# frame_size and every band (bins, step, bits per bin), so a payload read
+# with another layout is told apart from a damaged one. Version 1 headers,
+# still read, had the first band's step (float32) in its place.
+HEADER_MAGIC = b"FFTS"
+HEADER_VERSION = 2
+_HEADER_STRUCT = struct.Struct(">4sBBIHHII")
+_HEADER_V1_STRUCT = struct.Struct(">4sBBIHHfI")
+HEADER_BITS = _HEADER_STRUCT.size * 8
+
+# Integer PCM full scale by sample width in bytes (8-bit PCM is unsigned,
+# centred on 128)
+_FULL_SCALE = {1: 128.0, 2: 32768.0, 4: 2147483648.0}
+
+# What a cover can hold with a given engine's settings: its sample_rate,
+# channels and duration (s), frames (per channel), the payload bits those
+# frames carry, and the longest message that fits, in bytes (after the
+# header or terminator)
+Capacity = namedtuple("Capacity", "sample_rate channels duration frames bits max_message_bytes")
+
+# Header flags: how to hand the payload bytes back. Headers written before
+# these existed carry 0, i.e. text with one byte per character (latin-1).
+FLAG_BINARY = 0x01
+FLAG_UTF8 = 0x02
+
+# ── Block-framed container ──────────────────────────────────────────────────
+# With block_frames set, the payload is split over fixed runs of
+# block_frames frames, each opening with its own header: sync word, version,
+# flags, block_frames, sequence number, total payload length in bytes, and a
+# CRC-32 of the header fields before it plus the block's share of the
+# payload. 20 bytes (160 bits). Every block but the last fills its frames
+# (zero-padded to the bit), so block n starts at frame n * block_frames and
+# any frame range decodes without the ones before it.
+BLOCK_SYNC = b"FFTB"
+BLOCK_VERSION = 1
+_BLOCK_STRUCT = struct.Struct(">4sBBHIII")
+BLOCK_HEADER_BITS = _BLOCK_STRUCT.size * 8
+
+# One decoded block: its first frame, sequence number (the slot's expected
+# number when invalid), whether the CRC matched, and, for valid blocks, the
+# payload flags, total payload length and this block's payload bytes
+Block = namedtuple("Block", "frame seq valid flags length payload")
+
+# extract_blocks() result: the message, with the bytes of corrupt or
+# missing blocks zero-filled, every decoded Block, and the sequence numbers
+# that could not be recovered
+BlockPayload = namedtuple("BlockPayload", "message blocks corrupt")
+
+
+class CorruptBlocksError(ValueError):
+    """Raised by extract() when some blocks of a block-framed payload fail
+    their CRC or are missing. result is the full BlockPayload, with every
+    intact block recovered."""
+
+    def __init__(self, result):
+        super().__init__(f"{len(result.corrupt)} payload block(s) corrupt or missing: {result.corrupt}.")
+        self.result = result
+
+    def __reduce__(self):
+        # Rebuilt from the result when passed back from a worker process
+        return type(self), (self.result,)
 
-    X_padded = np.zeros(n_padded, dtype=complex)
-    X_padded[:N] = X
-    return np.conjugate(_fft_recursive(np.conjugate(X_padded))) / n_padded
 
 class FFTSteganography:
-    def __init__(self, frame_size=1024, freq_range=(100, 300), step=0.1):
+    def __init__(self, frame_size=1024, freq_range=(100, 300), step=0.1, header=True, chunk_frames=None,
+                 workers=1, instrument=False, multichannel=False, spectrum_cache=None, bands=None,
+                 precision="float64", block_frames=None):
         """
         Initialize the steganography engine.
-        :param frame_size: Size of FFT frames.
+        :param frame_size: Size of FFT frames; a power of 2.
         :param freq_range: Range of frequency bins (mid-frequencies) to use for embedding.
         :param step: Magnitude quantization step for embedding.
+        :param bands: Optional multi-band layout replacing freq_range/step:
+                      a list of (lo, hi[, step[, bits_per_bin]]) bin ranges,
+                      filled in order. step defaults to the step above;
+                      bits_per_bin (1-8) > 1 uses multi-level QIM with
+                      2 ** bits_per_bin levels. See density().
+        :param header: Write a length-prefixed payload header. If False, the
+                       legacy terminator-delimited format is written instead.
+                       Both formats are always readable.
+        :param chunk_frames: Streaming mode. Process the audio this many frames
+                             at a time through a memory map, writing output
+                             incrementally, so peak memory does not depend on
+                             the file length. None processes the file at once.
+        :param workers: Number of worker processes to shard frames across.
+                        With more than one, call close() when done to shut
+                        the pool down.
+        :param instrument: Record a StageStats for every call into last_stats.
+                           A stats object can also be passed per call.
+        :param multichannel: Embed into every channel of the cover, each
+                             carrying its own share of the bits, and write
+                             the output with the cover's channel count and
+                             sample format (8-bit covers become 16-bit, as
+                             8 bits cannot hold the payload). Otherwise the
+                             cover is downmixed to 16-bit mono. extract() reads multichannel
+                             files either way.
+        :param spectrum_cache: Optional SpectrumCache (may be shared between
+                               engines). Embeds into a cover seen before
+                               reuse its cached spectra and skip the forward
+                               FFT; frames are then transformed in-process
+                               even with workers > 1.
+        :param precision: "float64" (default) or "float32". float32 keeps
+                          samples in float32 and spectra in complex64 end to
+                          end, halving the memory traffic, and writes the
+                          output in the cover's sample format (16-, 24- or
+                          32-bit PCM, or float) instead of 16-bit; 8-bit
+                          covers are still written as 16-bit.
+        :param block_frames: Write the block-framed container instead of one
+                             header: the payload is split into blocks of this
+                             many frames (per channel), each with a sync word,
+                             sequence number and CRC, so any frame range can
+                             be decoded on its own (decode_blocks) and
+                             corrupt blocks are reported rather than
+                             spoiling the rest (extract_blocks). Extraction
+                             detects the format either way.
         """
+        if frame_size < 2 or frame_size & (frame_size - 1):
+            raise ValueError(f"frame_size must be a power of 2 (at least 2), not {frame_size}.")
         self.frame_size = frame_size
-        self.freq_range = freq_range
-        self.step = step
+        if bands is None:
+            bands = [(freq_range[0], freq_range[1], step, 1)]
+        else:
+            # Fill in the default step and one bit per bin
+            bands = [tuple(band) + (step, 1)[len(band) - 2:] for band in bands]
+            bands = [(int(lo), int(hi), float(band_step), int(bits)) for lo, hi, band_step, bits in bands]
+        self.bands = bands
+        # Span and first step of the layout; recorded in the payload header
+        self.freq_range = (min(b[0] for b in bands), max(b[1] for b in bands))
+        self.step = bands[0][2]
+        self.header = header
+        self.chunk_frames = chunk_frames
+        self.workers = workers
+        self._pool = None
+        self.instrument = instrument
+        self.multichannel = multichannel
+        self.spectrum_cache = spectrum_cache
+        if precision not in ("float64", "float32"):
+            raise ValueError(f"precision must be 'float64' or 'float32', not {precision!r}.")
+        self.precision = precision
+        self._float = np.dtype(precision)
+        if block_frames is not None and (not header or not 1 <= block_frames <= 0xFFFF):
+            raise ValueError("block_frames must be 1-65535 and needs the header format (header=True).")
+        self.block_frames = block_frames
+        self.last_stats = None
         self.terminator = "###END###"
 
-    def _text_to_bits(self, text):
-        bits = []
-        for char in text:
-            bin_val = bin(ord(char))[2:].zfill(8)
-            bits.extend([int(b) for b in bin_val])
-        return bits
+        for lo, hi, band_step, bits in bands:
+            if not 0 <= lo < hi <= frame_size // 2 + 1:
+                raise ValueError(f"freq_range {(lo, hi)} must lie within the {frame_size // 2 + 1}-bin half-spectrum of a {frame_size}-sample frame.")
+            if band_step <= 0 or not 1 <= bits <= 8:
+                raise ValueError(f"Band {(lo, hi)} needs step > 0 and 1-8 bits per bin.")
+        spans = sorted(b[:2] for b in bands)
+        if any(prev_hi > lo for (_, prev_hi), (lo, _) in zip(spans, spans[1:])):
+            raise ValueError(f"Bands {spans} overlap.")
 
-    def _bits_to_text(self, bits):
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = bits[i:i+8]
-            if len(byte) < 8:
-                break
-            char_code = int("".join(map(str, byte)), 2)
-            chars.append(chr(char_code))
-        return "".join(chars)
+    def _encode_message(self, message):
+        """Payload bytes and header flags for a message: str is encoded as
+        UTF-8, anything bytes-like (bytes, bytearray, memoryview, uint8
+        array) is embedded as-is."""
+        if isinstance(message, str):
+            return message.encode("utf-8"), FLAG_UTF8
+        return memoryview(message).cast("B"), FLAG_BINARY
 
-    def embed(self, input_path, message, output_path):
+    def _decode_message(self, payload, flags):
+        if flags & FLAG_BINARY:
+            return payload
+        if flags & FLAG_UTF8:
+            return payload.decode("utf-8", errors="replace")
+        return payload.decode("latin-1")
+
+    @property
+    def bits_per_frame(self):
+        return sum((hi - lo) * bits for lo, hi, _, bits in self.bands)
+
+    def density(self, sample_rate=None):
+        """Payload density of the embedding layout: bits per frame (per
+        channel) overall and per band, bits per sample, and bits per second
+        at sample_rate if given."""
+        bits_per_frame = self.bits_per_frame
+        return {
+            "bits_per_frame": bits_per_frame,
+            "bits_per_sample": bits_per_frame / self.frame_size,
+            "bits_per_second": None if sample_rate is None else bits_per_frame * sample_rate / self.frame_size,
+            "bands": [{"bins": [lo, hi], "step": step, "bits_per_bin": bits, "bits_per_frame": (hi - lo) * bits}
+                      for lo, hi, step, bits in self.bands],
+        }
+
+    def _frames_for_bits(self, n_bits, channels=1):
+        """Frames (per channel) needed to carry n_bits over channels."""
+        return -(-n_bits // (self.bits_per_frame * channels))
+
+    def _layout_crc(self):
+        """CRC-32 of frame_size and the band layout, as recorded in the
+        payload header."""
+        layout = struct.pack(">I", self.frame_size) + b"".join(
+            struct.pack(">HHfB", lo, hi, step, bits) for lo, hi, step, bits in self.bands)
+        return zlib.crc32(layout)
+
+    def _header_bits(self, payload_len, flags):
+        header = _HEADER_STRUCT.pack(
+            HEADER_MAGIC, HEADER_VERSION, flags, self.frame_size,
+            self.freq_range[0], self.freq_range[1], self._layout_crc(), payload_len)
+        return bytes_to_bits(header)
+
+    def _parse_header(self, bits):
+        """Parse the payload header from the first HEADER_BITS bits.
+        Returns (payload length in bytes, flags), or None if the bits do not
+        start with a header (i.e. a legacy terminator-delimited payload).
         """
-        Embed message into audio file.
+        raw = bits_to_bytes(bits[:HEADER_BITS])
+        if len(raw) < _HEADER_STRUCT.size or not raw.startswith(HEADER_MAGIC):
+            return None
+
+        version = raw[len(HEADER_MAGIC)]
+        if version == HEADER_VERSION:
+            _, _, flags, _, _, _, layout_crc, length = _HEADER_STRUCT.unpack(raw)
+            # Read with another layout, every field past the bins both layouts
+            # share is noise: report the layout, not those fields
+            if layout_crc != self._layout_crc():
+                raise ValueError(
+                    f"Payload was embedded with a different band layout; this engine uses "
+                    f"frame_size={self.frame_size}, bands={[tuple(band) for band in self.bands]}.")
+            return length, flags
+        if version != 1:
+            raise ValueError(f"Unsupported payload header version {version}.")
+        _, _, flags, frame_size, lo, hi, step, length = _HEADER_V1_STRUCT.unpack(raw)
+        if (frame_size, lo, hi) != (self.frame_size, *self.freq_range) or step != np.float32(self.step):
+            raise ValueError(
+                f"Payload was embedded with frame_size={frame_size}, freq_range=({lo}, {hi}), "
+                f"step={step:g}; this engine uses frame_size={self.frame_size}, "
+                f"freq_range={tuple(self.freq_range)}, step={self.step:g}.")
+        return length, flags
+
+    def _to_float(self, data, hooks=_NO_HOOKS, per_channel=False):
+        """Mono float view (float64, or float32 in float32 precision) of (a
+        slice of) WAV data, normalized to [-1, 1] if it was integer PCM.
+
+        With per_channel, channels are kept apart instead of downmixed and
+        their frames are laid out one after another (frame 0 of every
+        channel, then frame 1, ...), so a multichannel slice, a whole
+        number of frames long, is transformed like a longer mono signal.
         """
-        sample_rate, data = wavfile.read(input_path)
-        
-        # Convert to mono float64
-        if len(data.shape) > 1:
-            audio = data.mean(axis=1).astype(np.float64)
+        stats = hooks.stats
+        data = np.asarray(data)
+        with stats.stage("normalize"):
+            if len(data.shape) > 1 and not per_channel:
+                # Integer PCM is averaged straight into the working
+                # precision, float PCM in its own
+                mean_dtype = self._float if data.dtype.kind in "iu" else None
+                audio = data.mean(axis=1, dtype=mean_dtype).astype(self._float, copy=False)
+            else:
+                # Float input already in the working precision is not copied
+                audio = data.astype(self._float, copy=False)
+
+            if data.dtype == np.uint8:
+                audio -= 128.0
+            if data.dtype.kind in "iu":
+                audio /= _FULL_SCALE[data.dtype.itemsize]
+
+            if len(audio.shape) > 1:
+                channels = audio.shape[1]
+                audio = audio.reshape(-1, self.frame_size, channels).transpose(0, 2, 1).reshape(-1)
+        return audio
+
+    def _from_float(self, audio, dtype, channels=1, hooks=_NO_HOOKS):
+        """Inverse of _to_float: float samples back to dtype samples, shaped
+        (n, channels) again if they were laid out per channel."""
+        if channels > 1:
+            audio = audio.reshape(-1, channels, self.frame_size).transpose(0, 2, 1).reshape(-1, channels)
+        with hooks.stats.stage("quantize"):
+            if dtype.kind == "f":
+                return audio.astype(dtype)
+            # Clip to avoid overflow. float32 rounds 2**31 - 1 up to 2**31,
+            # so 32-bit output is scaled in double precision
+            scale = _FULL_SCALE[dtype.itemsize] - 1
+            pcm = np.clip(audio, -1, 1) * (np.float64(scale) if dtype.itemsize == 4 else scale)
+            if dtype == np.uint8:
+                pcm += 128.0
+            return pcm.astype(dtype)
+
+    def _output_format(self, data):
+        """(channels, dtype) of the stego output for WAV data: the cover's
+        channels in multichannel mode, mono otherwise, and the cover's
+        sample format in multichannel mode or float32 precision, 16-bit
+        otherwise. 8-bit PCM is always written as 16-bit: its quantization
+        step is far coarser than the QIM step, so the payload would not
+        survive. channels is also the number of parallel bit streams."""
+        channels = data.shape[1] if self.multichannel and len(data.shape) > 1 else 1
+        if (self.multichannel or self.precision == "float32") and data.dtype != np.uint8:
+            return channels, data.dtype
+        return channels, np.dtype(np.int16)
+
+    @staticmethod
+    def _sample_bits(info, dtype):
+        """Bits per sample to write dtype output for a cover with: the
+        cover's own when the output keeps its format (so 24-bit covers,
+        read as int32, are written back as 24-bit), dtype's otherwise."""
+        return info.sample_bits if dtype == info.dtype else None
+
+    def _read_frames(self, data, start, stop, hooks, per_channel=True):
+        """Normalized float samples of frames [start, stop) of WAV data,
+        per channel unless per_channel is False. With memory-mapped data
+        this is where the samples are actually read."""
+        chunk = data[start * self.frame_size : stop * self.frame_size]
+        hooks.stats.count("bytes_read", chunk.nbytes)
+        return self._to_float(chunk, hooks, per_channel)
+
+    def _decode_frames(self, data, start, stop, hooks=_NO_HOOKS, total=None):
+        """QIM bits carried by frames [start, stop) of WAV data, reading,
+        normalizing and transforming only those samples (chunk_frames at a
+        time in streaming mode, or when progress/cancel hooks are given).
+        Each channel of multichannel data carries its own bits, interleaved
+        frame by frame."""
+        chunk = self._chunk_frames(stop - start, hooks)
+        parts = []
+        for i in range(start, stop, chunk):
+            hooks.tick(i, total or stop)
+            j = min(i + chunk, stop)
+            parts.append(self._decode_audio(self._read_frames(data, i, j, hooks), hooks))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+
+    def _chunk_frames(self, num_frames, hooks):
+        """Frames per processing chunk: chunk_frames in streaming mode, small
+        chunks when someone is watching progress or may cancel, otherwise all
+        of them at once."""
+        if self.chunk_frames:
+            return self.chunk_frames
+        if hooks.watched:
+            return _PROGRESS_CHUNK_FRAMES
+        return max(num_frames, 1)
+
+    def _hooks(self, progress, cancel, stats):
+        """Bundle one call's hooks. With instrument=True and no stats object
+        supplied, a fresh StageStats is created and kept as last_stats."""
+        if stats is None and self.instrument:
+            stats = StageStats()
+        if stats is not None:
+            self.last_stats = stats
+        return _Hooks(progress, cancel, stats)
+
+    def _decode_audio(self, audio, hooks=_NO_HOOKS):
+        """QIM bits carried by the consecutive frames of audio, sharded across
+        worker processes when workers > 1."""
+        stats = hooks.stats
+        num_frames = len(audio) // self.frame_size
+        stats.count("frames_processed", num_frames)
+        if self.workers <= 1 or num_frames < 2:
+            with stats.stage("forward_fft"):
+                magnitudes = np.abs(manual_rfft(self._frames(audio, num_frames)))
+            with stats.stage("qim"):
+                # Each frame's bits are its bands' bits, in layout order
+                bands = [_unpack_symbols(qim_extract(magnitudes[:, lo:hi], step, 1 << bits), bits)
+                         for lo, hi, step, bits in self.bands]
+                return np.concatenate(bands, axis=1).ravel()
+
+        bits = np.zeros(num_frames * self.bits_per_frame, dtype=np.uint8)
+        with stats.stage("sharded_transform"):
+            self._run_sharded(_decode_shard, audio, bits, num_frames, lambda start, stop: ())
+        return bits
+
+    def _frames(self, audio, num_frames):
+        """View the first num_frames * frame_size samples as a
+        (num_frames, frame_size) matrix, one frame per row."""
+        return audio[:num_frames * self.frame_size].reshape(num_frames, self.frame_size)
+
+    def _payload_bits(self, message, streams=1):
+        """Bits to embed for message over streams parallel channels: header
+        + payload, blocks in the block-framed container, or payload +
+        terminator in the legacy format."""
+        payload, flags = self._encode_message(message)
+        if self.block_frames:
+            return self._block_bits(payload, flags, streams)
+        if self.header:
+            return np.concatenate([self._header_bits(len(payload), flags), bytes_to_bits(payload)])
+        if flags & FLAG_BINARY:
+            # The terminator could occur inside arbitrary bytes
+            raise ValueError("Binary payloads need the header format (header=True).")
+        return bytes_to_bits(message.encode("utf-8") + self.terminator.encode("utf-8"))
+
+    def _block_chunk(self, block_frames, streams):
+        """Payload bytes carried by each full block."""
+        return block_frames * streams * self.bits_per_frame // 8 - _BLOCK_STRUCT.size
+
+    def _block_bits(self, payload, flags, streams):
+        """Bits of the block-framed container for payload: one block per
+        block_frames frames, every block but the last padded to fill them."""
+        chunk = self._block_chunk(self.block_frames, streams)
+        if chunk <= 0:
+            raise ValueError(f"block_frames={self.block_frames} leaves no room for payload after "
+                             f"the {_BLOCK_STRUCT.size}-byte block header.")
+        block_bits = self.block_frames * streams * self.bits_per_frame
+        n_blocks = max(-(-len(payload) // chunk), 1)
+        blocks = []
+        for seq in range(n_blocks):
+            part = bytes(payload[seq * chunk : (seq + 1) * chunk])
+            fields = _BLOCK_STRUCT.pack(BLOCK_SYNC, BLOCK_VERSION, flags, self.block_frames,
+                                        seq, len(payload), 0)[:-4]
+            crc = zlib.crc32(fields + part)
+            bits = bytes_to_bits(fields + struct.pack(">I", crc) + part)
+            if seq < n_blocks - 1:
+                bits = np.concatenate([bits, np.zeros(block_bits - len(bits), dtype=np.uint8)])
+            blocks.append(bits)
+        return np.concatenate(blocks)
+
+    def capacity(self, source):
+        """Capacity of a WAV cover (path, binary file object or bytes-like
+        buffer, or its already parsed WavInfo) for this engine's settings.
+        Only the header is parsed, so this is instant whatever the file
+        size."""
+        info = source if isinstance(source, wav_stream.WavInfo) else wav_stream.read_wav_info(source)
+        frames = info.n_samples // self.frame_size
+        streams = info.channels if self.multichannel else 1
+        bits = frames * streams * self.bits_per_frame
+        if self.block_frames:
+            # Full blocks, plus whatever a shorter last block can carry
+            full, rest = divmod(frames, self.block_frames)
+            max_bytes = (full * max(self._block_chunk(self.block_frames, streams), 0)
+                         + max(self._block_chunk(rest, streams), 0))
         else:
-            audio = data.astype(np.float64)
+            overhead = HEADER_BITS // 8 if self.header else len(self.terminator.encode("utf-8"))
+            max_bytes = max(bits // 8 - overhead, 0)
+        return Capacity(info.sample_rate, info.channels, info.n_samples / info.sample_rate,
+                        frames, bits, max_bytes)
+
+    def message_size(self, message):
+        """Bytes message occupies in the payload (its UTF-8 length for
+        text), to compare against Capacity.max_message_bytes."""
+        payload, _ = self._encode_message(message)
+        return len(payload)
+
+    def check_capacity(self, source, message):
+        """Pre-flight check from the header alone: raise ValueError if
+        message does not fit in the cover. Returns the Capacity."""
+        capacity = self.capacity(source)
+        size = self.message_size(message)
+        if size > capacity.max_message_bytes:
+            raise ValueError(f"Message too long for the given audio: {size} bytes, "
+                             f"capacity {capacity.max_message_bytes} bytes.")
+        return capacity
+
+    def _check_capacity(self, total_bits, num_frames):
+        capacity = num_frames * self.bits_per_frame
+        if total_bits > capacity:
+            raise ValueError(f"Message too long for the given audio. Embedded {capacity}/{total_bits} bits.")
+
+    def _embed_frames(self, audio, bits, hooks=_NO_HOOKS):
+        """Embed bits into the consecutive frames of audio (float samples,
+        length a multiple of frame_size) and return the stego samples.
+        bits may run out before the last frame."""
+        magnitudes, phases = self._spectrum(audio, hooks)
+        return self._embed_spectrum(magnitudes, phases, bits, hooks)
 
-        # Normalize to [-1, 1] if it was 16-bit PCM
-        if data.dtype == np.int16:
-            audio /= 32768.0
+    def _spectrum(self, audio, hooks=_NO_HOOKS):
+        """Magnitudes and phases of the consecutive frames of audio, one
+        frame per row."""
+        # Forward FFT of every frame in one batched pass; audio is real, so
+        # only the non-negative half-spectrum is computed
+        with hooks.stats.stage("forward_fft"):
+            f_transform = manual_rfft(self._frames(audio, len(audio) // self.frame_size))
+            return np.abs(f_transform), np.angle(f_transform)
 
-        message_with_term = message + self.terminator
-        bits = self._text_to_bits(message_with_term)
-        bit_idx = 0
+    def _embed_spectrum(self, magnitudes, phases, bits, hooks=_NO_HOOKS):
+        """QIM-embed bits into frame spectra (modifying magnitudes in place)
+        and return the stego samples from the inverse FFT."""
+        stats = hooks.stats
+        bits_per_frame = self.bits_per_frame
         total_bits = len(bits)
 
-        num_frames = len(audio) // self.frame_size
-        stego_audio = np.zeros_like(audio)
-
-        for i in range(num_frames):
-            frame = audio[i * self.frame_size : (i + 1) * self.frame_size]
-            
-            # FFT
-            f_transform = manual_fft(frame)
-            magnitudes = np.abs(f_transform)
-            phases = np.angle(f_transform)
-
-            # Embed bits into magnitude
-            # Use only freq_range to avoid audible distortion in lows/highs
-            for freq in range(self.freq_range[0], self.freq_range[1]):
-                if bit_idx < total_bits:
-                    bit = bits[bit_idx]
-                    
-                    # QIM (Quantization Index Modulation) on magnitude
-                    # magnitude' = round(magnitude / step) * step
-                    # If bit is 1, shift by step/2
-                    m = magnitudes[freq]
-                    q = np.floor(m / self.step)
-                    
-                    if bit == 1:
-                        if q % 2 == 0:
-                            magnitudes[freq] = (q + 1) * self.step
-                        else:
-                            magnitudes[freq] = q * self.step
-                    else:
-                        if q % 2 == 1:
-                            magnitudes[freq] = (q + 1) * self.step
-                        else:
-                            magnitudes[freq] = q * self.step
-                    
-                    # Also update the symmetric component for real FFT result
-                    magnitudes[self.frame_size - freq] = magnitudes[freq]
-                    
-                    bit_idx += 1
-
-            # Reconstruct frame
+        # Lay the bits out one frame per row over the bands (lows/highs are
+        # left alone to avoid audible distortion); the last row may be partial
+        with stats.stage("qim"):
+            used_frames = self._frames_for_bits(total_bits)
+            bit_matrix = np.zeros(used_frames * bits_per_frame, dtype=np.uint8)
+            bit_matrix[:total_bits] = bits
+            bit_matrix = bit_matrix.reshape(used_frames, bits_per_frame)
+            row_start = np.arange(used_frames)[:, None] * bits_per_frame
+
+            offset = 0
+            for lo, hi, step, n_bits in self.bands:
+                width = (hi - lo) * n_bits
+                symbols = _pack_symbols(bit_matrix[:, offset : offset + width], n_bits)
+                # A bin is embedded if its first bit belongs to the payload
+                mask = row_start + offset + np.arange(0, width, n_bits) < total_bits
+                band = magnitudes[:used_frames, lo:hi]
+                magnitudes[:used_frames, lo:hi] = np.where(mask, qim_embed(band, symbols, step, 1 << n_bits), band)
+                offset += width
+
+        # Reconstruct all frames in one batched inverse pass. The inverse real
+        # FFT implies the mirrored bins, so the result is real by construction
+        with stats.stage("inverse_fft"):
             new_f_transform = magnitudes * np.exp(1j * phases)
-            stego_frame = np.real(manual_ifft(new_f_transform))
-            stego_audio[i * self.frame_size : (i + 1) * self.frame_size] = stego_frame
-
-        if bit_idx < total_bits:
-            raise ValueError(f"Message too long for the given audio. Embedded {bit_idx}/{total_bits} bits.")
-
-        # Convert back to 16-bit PCM
-        # Clip to avoid overflow
-        stego_audio = np.clip(stego_audio, -1, 1)
-        stego_audio_int = (stego_audio * 32767).astype(np.int16)
-        
-        wavfile.write(output_path, sample_rate, stego_audio_int)
+            return manual_irfft(new_f_transform, self.frame_size).reshape(-1)
+
+    def _embed_audio(self, audio, bits, hooks=_NO_HOOKS):
+        """_embed_frames, sharded across worker processes when workers > 1.
+        Frames are independent once each one's slice of bits is known."""
+        stats = hooks.stats
+        num_frames = len(audio) // self.frame_size
+        stats.count("frames_processed", num_frames)
+        stats.count("bits_embedded", len(bits))
+        if self.workers <= 1 or num_frames < 2:
+            return self._embed_frames(audio, bits, hooks)
+
+        bpf = self.bits_per_frame
+        stego_audio = np.zeros(len(audio), dtype=audio.dtype)
+        with stats.stage("sharded_transform"):
+            self._run_sharded(_embed_shard, audio, stego_audio, num_frames,
+                              lambda start, stop: (bits[start * bpf : stop * bpf],))
+        return stego_audio
+
+    def _embed_chunk(self, data, start, stop, bits, hooks, cache_key=None):
+        """Stego float samples for payload frames [start, stop) of WAV data.
+        With a cache_key the spectra come from the spectrum cache (computed
+        and stored on a miss); otherwise the frames are read and transformed
+        afresh, sharded when workers > 1."""
+        if cache_key is None:
+            return self._embed_audio(self._read_frames(data, start, stop, hooks, self.multichannel), bits, hooks)
+        magnitudes, phases = self._cached_spectrum(cache_key, data, start, stop, hooks)
+        hooks.stats.count("frames_processed", len(magnitudes))
+        hooks.stats.count("bits_embedded", len(bits))
+        # Cached magnitudes must survive the in-place QIM
+        return self._embed_spectrum(np.array(magnitudes), phases, bits, hooks)
+
+    def _cache_key(self, data, hooks):
+        """Spectrum cache key for WAV data: a hash of its samples plus
+        everything else that shapes the spectra computed from them."""
+        import hashlib
+        digest = hashlib.blake2b(digest_size=16)
+        with hooks.stats.stage("hash"):
+            for start in range(0, len(data), _HASH_BLOCK):
+                digest.update(np.ascontiguousarray(data[start : start + _HASH_BLOCK]))
+                wav_stream.release(data, start + _HASH_BLOCK)
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+        layout = "split" if self.multichannel else "mix"
+        return f"{digest.hexdigest()}-{data.dtype.name}-{channels}ch-{layout}-{self.frame_size}-{self.precision}"
+
+    def _cached_spectrum(self, key, data, start, stop, hooks):
+        """Spectra of frames [start, stop) of WAV data (one row per frame
+        and channel when laid out per channel). Frames the cached prefix
+        does not reach yet are transformed and appended to it."""
+        streams = data.shape[1] if self.multichannel and len(data.shape) > 1 else 1
+        entry = self.spectrum_cache.get(key)
+        cached = 0 if entry is None else len(entry[0]) // streams
+        hooks.stats.count("cached_frames", max(min(cached, stop) - start, 0) * streams)
+        if cached < stop:
+            magnitudes, phases = self._spectrum(self._read_frames(data, cached, stop, hooks, self.multichannel), hooks)
+            if entry is not None:
+                magnitudes = np.concatenate([entry[0], magnitudes])
+                phases = np.concatenate([entry[1], phases])
+            self.spectrum_cache.put(key, magnitudes, phases)
+            entry = (magnitudes, phases)
+        rows = slice(start * streams, stop * streams)
+        return entry[0][rows], entry[1][rows]
+
+    def _run_sharded(self, worker, audio, out, num_frames, shard_args):
+        """Split frames into one contiguous shard per worker and run
+        worker(engine, in_spec, out_spec, start, stop, *shard_args(start, stop))
+        on the pool. audio and out are passed through shared memory, so only
+        the shard bounds (and per-shard arguments) are pickled."""
+        from multiprocessing import shared_memory
+        shm_in = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+        shm_out = shared_memory.SharedMemory(create=True, size=max(out.nbytes, 1))
+        try:
+            in_spec = (shm_in.name, audio.shape, audio.dtype.str)
+            out_spec = (shm_out.name, out.shape, out.dtype.str)
+            _SharedArray.view(shm_in, in_spec)[:] = audio
+
+            shard = -(-num_frames // self.workers)
+            engine = self._shard_engine()
+            futures = [
+                self._executor().submit(worker, engine, in_spec, out_spec, start, min(start + shard, num_frames),
+                                        *shard_args(start, min(start + shard, num_frames)))
+                for start in range(0, num_frames, shard)
+            ]
+            for future in futures:
+                future.result()
+            out[:] = _SharedArray.view(shm_out, out_spec)
+        finally:
+            for shm in (shm_in, shm_out):
+                shm.close()
+                shm.unlink()
+
+    def _shard_engine(self):
+        """Picklable copy of the transform settings for worker processes."""
+        return FFTSteganography(self.frame_size, header=self.header, bands=self.bands, precision=self.precision)
+
+    def _executor(self):
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def warm_up(self):
+        """Build the FFT tables for this frame size and precision now, so
+        the first embed or extract does not pay for them."""
+        manual_irfft(manual_rfft(np.zeros((1, self.frame_size), dtype=self._float)), self.frame_size)
+
+    def close(self):
+        """Shut down the worker pool, if one was started (workers > 1)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _passthrough(self, data, hooks=_NO_HOOKS):
+        """Output samples for data that carries no payload. Input already in
+        the output format (in the output dtype, and mono or in multichannel
+        mode) is copied as-is; anything else only goes through the mono
+        downmix (kept per channel in multichannel mode) and PCM conversion,
+        never through the FFT."""
+        channels, dtype = self._output_format(data)
+        if data.dtype == dtype and (self.multichannel or len(data.shape) == 1):
+            with hooks.stats.stage("passthrough"):
+                return np.array(data)
+        if self.multichannel:
+            # Interleaved samples converted as one long mono signal
+            return self._from_float(self._to_float(data.reshape(-1), hooks), dtype, hooks=hooks).reshape(data.shape)
+        return self._from_float(self._to_float(data, hooks), dtype, hooks=hooks)
+
+    def embed(self, input_path, message, output_path, progress=None, cancel=None, stats=None):
+        """
+        Embed message into audio file.
+        Only the frames that carry payload bits are transformed; every other
+        sample is copied through, so the cost depends on the message length,
+        not on the cover length.
+        :param message: Text (embedded as UTF-8) or bytes-like binary data;
+                        extract() hands it back as str or bytes accordingly.
+        :param progress: Optional callable(frames_done, frames_total), called
+                         between chunks of payload frames.
+        :param cancel: Optional threading.Event; once set, the operation stops
+                       at the next chunk boundary with OperationCancelled.
+        :param stats: Optional StageStats (or any object with the same
+                      stage()/count() methods) to record this call into.
+        """
+        return self.embed_file(input_path, message, output_path, progress, cancel, stats)
+
+    def embed_file(self, source, message, target, progress=None, cancel=None, stats=None):
+        """
+        embed() for a path or binary file object (e.g. io.BytesIO) on either
+        side. A file object target is written from its current position and
+        left open.
+        """
+        hooks = self._hooks(progress, cancel, stats)
+        # Reject an oversized message before any samples are read
+        self.check_capacity(source, message)
+        if self.chunk_frames:
+            return self._embed_streaming(source, message, target, hooks)
+
+        with hooks.stats.stage("read"):
+            info, data = wav_stream.open_wav(source)
+        hooks.stats.count("bytes_read", data.nbytes)
+
+        stego_audio = self._embed_array(data, message, hooks)
+        channels = stego_audio.shape[1] if len(stego_audio.shape) > 1 else 1
+        sample_bits = self._sample_bits(info, stego_audio.dtype)
+        # Release the cover's memory map before writing, in case the target
+        # is the cover itself
+        del data
+
+        with hooks.stats.stage("write"):
+            with wav_stream.WavWriter(target, info.sample_rate, channels, stego_audio.dtype, sample_bits) as out:
+                out.write(stego_audio)
         return True
 
-    def extract(self, stego_path):
+    def embed_bytes(self, wav_bytes, message, progress=None, cancel=None, stats=None):
+        """embed() from WAV bytes (or any buffer) to WAV bytes."""
+        target = io.BytesIO()
+        self.embed_file(io.BytesIO(wav_bytes), message, target, progress, cancel, stats)
+        return target.getvalue()
+
+    def embed_array(self, sample_rate, audio, message, progress=None, cancel=None, stats=None):
+        """
+        embed() on samples already in memory, as returned by wavfile.read:
+        shape (n,) or (n, channels), any dtype wavfile produces. audio is
+        only read, never modified: the output is one new array, copied from
+        it (or converted, if its format differs), in which just the payload
+        frames go through the FFT. Returns (sample_rate, stego_audio) with
+        16-bit mono samples (audio's dtype in float32 precision, and its
+        channels too in multichannel mode; 16-bit for 8-bit audio), ready
+        for wavfile.write.
+        """
+        hooks = self._hooks(progress, cancel, stats)
+        return sample_rate, self._embed_array(audio, message, hooks)
+
+    def _embed_array(self, data, message, hooks):
+        channels, dtype = self._output_format(data)
+        bits = self._payload_bits(message, channels)
+        self._check_capacity(len(bits), len(data) // self.frame_size * channels)
+        used_frames = self._frames_for_bits(len(bits), channels)
+
+        stego_audio = self._passthrough(data, hooks)
+
+        # Convert the payload frames to float (mono, or per channel),
+        # normalized to [-1, 1] if it was integer PCM, embed, and convert
+        # back to the output format
+        bpf = self.bits_per_frame * channels
+        cache_key = self._cache_key(data, hooks) if self.spectrum_cache is not None else None
+        chunk = self._chunk_frames(used_frames, hooks)
+        for start in range(0, used_frames, chunk):
+            hooks.tick(start, used_frames)
+            stop = min(start + chunk, used_frames)
+            stego_frames = self._embed_chunk(data, start, stop, bits[start * bpf : stop * bpf], hooks, cache_key)
+            stego_audio[start * self.frame_size : stop * self.frame_size] = self._from_float(
+                stego_frames, dtype, channels, hooks)
+        hooks.done(used_frames)
+        return stego_audio
+
+    def _embed_streaming(self, source, message, target, hooks):
+        """embed() in constant memory: the input is memory-mapped, payload
+        frames are processed chunk_frames at a time, the rest is block-copied,
+        and each chunk is appended to the output as soon as it is ready.
+        Pages of the cover are released once read, so neither the mapping
+        nor the output grows the resident set with the file's length."""
+        stats = hooks.stats
+        with stats.stage("read"):
+            info, data = wav_stream.open_wav(source)
+
+        channels, dtype = self._output_format(data)
+        bits = self._payload_bits(message, channels)
+        self._check_capacity(len(bits), info.n_samples // self.frame_size * channels)
+        used_frames = self._frames_for_bits(len(bits), channels)
+
+        bpf = self.bits_per_frame * channels
+        block = self.chunk_frames * self.frame_size
+        cache_key = self._cache_key(data, hooks) if self.spectrum_cache is not None else None
+        # The cover stays memory-mapped while the output is written, so a path
+        # target goes to a temporary file first (target may be the cover itself)
+        output = target
+        if isinstance(target, (str, os.PathLike)):
+            output = f"{os.fspath(target)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with wav_stream.WavWriter(output, info.sample_rate, channels, dtype,
+                                      self._sample_bits(info, dtype)) as out:
+                for start in range(0, used_frames, self.chunk_frames):
+                    hooks.tick(start, used_frames)
+                    stop = min(start + self.chunk_frames, used_frames)
+                    stego_frames = self._embed_chunk(data, start, stop, bits[start * bpf : stop * bpf], hooks, cache_key)
+                    wav_stream.release(data, stop * self.frame_size)
+                    stego_audio = self._from_float(stego_frames, dtype, channels, hooks)
+                    with stats.stage("write"):
+                        out.write(stego_audio)
+                hooks.done(used_frames)
+
+                for start in range(used_frames * self.frame_size, info.n_samples, block):
+                    stats.count("bytes_read", data[start : start + block].nbytes)
+                    stego_audio = self._passthrough(data[start : start + block], hooks)
+                    wav_stream.release(data, start + block)
+                    with stats.stage("write"):
+                        out.write(stego_audio)
+            if output is not target:
+                del data  # release the mapping before replacing the cover
+                os.replace(output, target)
+        except BaseException:
+            # Don't leave a half-written stego file behind
+            if output is not target and os.path.exists(output):
+                os.remove(output)
+            raise
+        return True
+
+    def extract(self, stego_path, progress=None, cancel=None, stats=None):
         """
         Extract message from audio file.
+        progress, cancel and stats work as for embed(). A block-framed
+        payload with corrupt or missing blocks raises CorruptBlocksError,
+        which carries everything that was recovered; extract_blocks()
+        returns that instead of raising.
         """
-        sample_rate, data = wavfile.read(stego_path)
-        
-        # Audio is likely already mono from our process, but handle just in case
-        if len(data.shape) > 1:
-            audio = data.mean(axis=1).astype(np.float64)
-        else:
-            audio = data.astype(np.float64)
+        return self.extract_file(stego_path, progress, cancel, stats)
 
-        if data.dtype == np.int16:
-            audio /= 32768.0
+    def extract_file(self, source, progress=None, cancel=None, stats=None):
+        """extract() from a path, binary file object (e.g. io.BytesIO) or
+        bytes-like buffer."""
+        hooks = self._hooks(progress, cancel, stats)
 
-        bits = []
-        num_frames = len(audio) // self.frame_size
+        # Memory-mapped (or viewed in place, for an in-memory buffer), so
+        # only the frames we actually decode are read
+        with hooks.stats.stage("read"):
+            _, data = wav_stream.open_wav(source)
+        return self._extract_array(data, hooks)
+
+    def extract_bytes(self, wav_bytes, progress=None, cancel=None, stats=None):
+        """extract() from WAV bytes (or any buffer), without copying them."""
+        return self.extract_file(memoryview(wav_bytes), progress, cancel, stats)
 
-        for i in range(num_frames):
-            frame = audio[i * self.frame_size : (i + 1) * self.frame_size]
-            f_transform = manual_fft(frame)
-            magnitudes = np.abs(f_transform)
+    def extract_array(self, sample_rate, audio, progress=None, cancel=None, stats=None):
+        """
+        extract() from samples already in memory, as returned by
+        wavfile.read. The sample rate plays no part in decoding; it is taken
+        so (sample_rate, audio) tuples pass straight through.
+        """
+        return self._extract_array(audio, self._hooks(progress, cancel, stats))
+
+    def _extract_array(self, data, hooks):
+        num_frames = len(data) // self.frame_size
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+
+        # The header sits in the first frame(s) and says exactly how many
+        # frames hold the payload
+        header_frames = min(self._frames_for_bits(HEADER_BITS, channels), num_frames)
+        bits = self._decode_frames(data, 0, header_frames, _Hooks(stats=hooks.stats))
+        # Every engine tries the formats in the same order, whatever it
+        # writes: block container, header, terminator, then a block
+        # container whose first block is damaged
+        blocks_scanned = False
+        if bits_to_bytes(bits[:32]) == BLOCK_SYNC:
+            layout = self._find_block(data, 0, num_frames, hooks)
+            blocks_scanned = True
+            # With no intact block, the sync word may just be the start of a
+            # header-less message
+            if layout is not None:
+                return self._extract_block_message(data, hooks, layout)
+        try:
+            header = self._parse_header(bits)
+        except ValueError as e:
+            # A legacy message may just happen to start with the magic: only
+            # report the header if no terminator turns up either
+            header, header_error = None, e
+        else:
+            header_error = None
 
-            for freq in range(self.freq_range[0], self.freq_range[1]):
-                m = magnitudes[freq]
-                q = np.round(m / self.step)
-                bits.append(int(q % 2))
+        if header is not None:
+            length, flags = header
+            total_bits = HEADER_BITS + length * 8
+            needed = self._frames_for_bits(total_bits, channels)
+            if needed > num_frames:
+                raise ValueError(f"Stego audio is truncated: payload needs {needed} frames, file has {num_frames}.")
+            bits = np.concatenate([bits, self._decode_frames(data, header_frames, needed, hooks)])
+            hooks.done(needed)
+            with hooks.stats.stage("decode_payload"):
+                return self._decode_message(bits_to_bytes(bits[HEADER_BITS:total_bits]), flags)
 
-            # Partial extraction check for terminator
-            # Check every frame for efficiency
-            current_text = self._bits_to_text(bits)
-            if self.terminator in current_text:
-                return current_text.split(self.terminator)[0]
+        # Legacy payload: scan for the terminator. Transform frames in batches
+        # so an early terminator still spares us the FFT of the rest of the file
+        decoder = TerminatorDecoder(self.terminator.encode("utf-8"))
+        message = decoder.feed(bits)
+        i = header_frames
+        while message is None and i < num_frames:
+            stop = min(i + _EXTRACT_BATCH_FRAMES, num_frames)
+            # Only the newly decoded bits are converted and scanned
+            frame_bits = self._decode_frames(data, i, stop, hooks, num_frames)
+            with hooks.stats.stage("decode_payload"):
+                message = decoder.feed(frame_bits)
+            i = stop
+        hooks.done(num_frames)
+        if message is not None:
+            # Written as UTF-8 since packed payloads; older files used one
+            # byte per character
+            try:
+                return message.decode("utf-8")
+            except UnicodeDecodeError:
+                return message.decode("latin-1")
+        if not blocks_scanned:
+            layout = self._find_block(data, 0, num_frames, hooks)
+            if layout is not None:
+                return self._extract_block_message(data, hooks, layout)
+        if header_error is not None:
+            raise header_error
 
         return "Terminator not found. Extraction may be incomplete."
 
+    def _extract_block_message(self, data, hooks, layout):
+        """extract() of a block container: the message, or CorruptBlocksError
+        if any block is damaged."""
+        result = self._extract_blocks(data, hooks, layout)
+        if result.corrupt:
+            raise CorruptBlocksError(result)
+        return result.message
+
+    # ── Block-framed container ──
+
+    def extract_blocks(self, source, progress=None, cancel=None, stats=None):
+        """
+        Extract a block-framed payload from a path, binary file object or
+        bytes-like buffer, checking every block's CRC. Corrupt or missing
+        blocks do not stop the extraction: their bytes are zero-filled and
+        their sequence numbers listed. Returns a BlockPayload.
+        """
+        hooks = self._hooks(progress, cancel, stats)
+        with hooks.stats.stage("read"):
+            _, data = wav_stream.open_wav(source)
+        return self._extract_blocks(data, hooks)
+
+    def decode_blocks(self, source, start=0, stop=None, progress=None, cancel=None, stats=None):
+        """
+        Decode the blocks that begin within frames [start, stop) of a
+        block-framed stego file, without reading any frame before start.
+        Ranges are independent, so a long payload can be split between
+        processes and decoded out of order. Returns a list of Block, one
+        per block slot in the range, valid or not.
+        """
+        hooks = self._hooks(progress, cancel, stats)
+        with hooks.stats.stage("read"):
+            _, data = wav_stream.open_wav(source)
+        layout = self._find_block(data, start, len(data) // self.frame_size if stop is None else stop, hooks)
+        if layout is None:
+            return []
+        return self._decode_blocks(data, start, stop, layout[0], hooks)
+
+    def _find_block(self, data, start, stop, hooks):
+        """First intact block beginning within frames [start, stop), found by
+        checking each frame boundary for the sync word (only boundaries
+        that are multiples of block_frames, when the engine has it set).
+        Returns (block_frames, Block), or None if there is none."""
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+        num_frames = len(data) // self.frame_size
+        stop = min(stop, num_frames)
+        sync_frames = self._frames_for_bits(BLOCK_HEADER_BITS, channels)
+        scan_hooks = _Hooks(cancel=hooks.cancel, stats=hooks.stats)
+        step = self.block_frames or 1
+        for frame in range(-(-start // step) * step, stop, step):
+            bits = self._decode_frames(data, frame, min(frame + sync_frames, num_frames), scan_hooks)
+            raw = bits_to_bytes(bits[:BLOCK_HEADER_BITS])
+            if not raw.startswith(BLOCK_SYNC) or len(raw) < _BLOCK_STRUCT.size:
+                continue
+            block_frames = _BLOCK_STRUCT.unpack(raw)[3]
+            if block_frames == 0 or frame % block_frames:
+                continue
+            bits = self._decode_frames(data, frame, min(frame + block_frames, num_frames), scan_hooks)
+            block = self._parse_block(bits, frame, block_frames, channels)
+            if block.valid:
+                return block_frames, block
+        return None
+
+    def _decode_blocks(self, data, start, stop, block_frames, hooks):
+        """Every block slot beginning within frames [start, stop), decoded in
+        one pass over their frames (sharded when workers > 1)."""
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+        num_frames = len(data) // self.frame_size
+        stop = num_frames if stop is None else min(stop, num_frames)
+        slots = range(-(-start // block_frames) * block_frames, stop, block_frames)
+        if not slots:
+            return []
+        bits = self._decode_frames(data, slots[0], min(slots[-1] + block_frames, num_frames), hooks)
+        block_bits = block_frames * channels * self.bits_per_frame
+        return [self._parse_block(bits[i * block_bits : (i + 1) * block_bits], frame, block_frames, channels)
+                for i, frame in enumerate(slots)]
+
+    def _parse_block(self, bits, frame, block_frames, channels):
+        """Parse and CRC-check the block at frame from its bits."""
+        invalid = Block(frame, frame // block_frames, False, None, None, b"")
+        raw = bits_to_bytes(bits)
+        if len(raw) < _BLOCK_STRUCT.size:
+            return invalid
+        sync, version, flags, frames, seq, length, crc = _BLOCK_STRUCT.unpack(raw[:_BLOCK_STRUCT.size])
+        if sync != BLOCK_SYNC or version != BLOCK_VERSION or frames != block_frames:
+            return invalid
+        chunk = self._block_chunk(block_frames, channels)
+        size = min(chunk, length - seq * chunk)
+        if size < 0 or (size == 0 and seq > 0):
+            return invalid
+        payload = raw[_BLOCK_STRUCT.size : _BLOCK_STRUCT.size + size]
+        if len(payload) < size or zlib.crc32(raw[:_BLOCK_STRUCT.size - 4] + payload) != crc:
+            return invalid
+        return Block(frame, seq, True, flags, length, payload)
+
+    def _extract_blocks(self, data, hooks, layout=None):
+        """extract_blocks() on WAV data: the first intact block gives the
+        layout and payload length (unless already found, as layout), then
+        exactly the frames holding the payload are decoded and every block
+        is checked."""
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+        num_frames = len(data) // self.frame_size
+        if layout is None:
+            layout = self._find_block(data, 0, num_frames, hooks)
+        if layout is None:
+            raise ValueError("No intact payload block found.")
+        block_frames, first = layout
+        chunk = self._block_chunk(block_frames, channels)
+        length, flags = first.length, first.flags
+        n_blocks = max(-(-length // chunk), 1)
+
+        blocks = self._decode_blocks(data, 0, n_blocks * block_frames, block_frames, hooks)
+        hooks.done(min(n_blocks * block_frames, num_frames))
+        with hooks.stats.stage("decode_payload"):
+            return self._assemble_blocks(blocks, chunk, length, flags)
+
+    def _assemble_blocks(self, blocks, chunk, length, flags):
+        """BlockPayload from decoded blocks. Blocks are placed by sequence
+        number, whatever order they were decoded in; missing and corrupt
+        ones are zero-filled."""
+        n_blocks = max(-(-length // chunk), 1)
+        good = {b.seq: b.payload for b in blocks
+                if b.valid and (b.length, b.flags) == (length, flags) and b.seq < n_blocks}
+        corrupt = [seq for seq in range(n_blocks) if seq not in good]
+        payload = b"".join(good.get(seq, bytes(min(chunk, length - seq * chunk))) for seq in range(n_blocks))
+        return BlockPayload(self._decode_message(payload, flags), blocks, corrupt)
+
+    # ── Live streams ──
+
+    def extract_stream(self, chunks, dtype=np.int16, channels=1, sample_bits=None, stats=None):
+        """
+        Generator: decode payloads from live PCM as it arrives, e.g. from a
+        pipe, stdin or a file that is still being written (see
+        wav_stream.read_chunks). Frames are counted from the start of the
+        stream, as in a file.
+
+        Each chunk may be any size, split anywhere, even inside a sample;
+        only whole frames are decoded and the partial frame left over is
+        buffered for the next chunk. Payloads (header or block-framed;
+        legacy terminator payloads are not detected) are looked for at
+        every frame boundary, and each message (str or bytes) is yielded
+        as soon as its last frame has arrived. A block-framed payload with
+        corrupt or missing blocks is yielded as its BlockPayload instead
+        (as CorruptBlocksError.result in extract()), and listening goes on;
+        a header that does not parse is taken as no payload at that frame.
+        Besides the partial frame, only the bits of the payload being
+        decoded are kept, so memory does not grow with the length of the
+        stream.
+
+        :param chunks: Iterable of bytes-like raw little-endian PCM, with
+                       channels interleaved.
+        :param dtype: Sample format of the PCM; with sample_bits=24, packed
+                      24-bit PCM (dtype is then ignored).
+        :param channels: Interleaved channels; each carries its own bits
+                         as in extract().
+        """
+        hooks = self._hooks(None, None, stats)
+        if sample_bits == 24:
+            dtype, width = np.dtype("u1"), 3
+        else:
+            dtype = np.dtype(dtype).newbyteorder("<")
+            width = dtype.itemsize
+        frame_bytes = self.frame_size * channels * width
+        scanner = _StreamScanner(self, channels)
+        pending = bytearray()
+        for chunk in chunks:
+            pending += chunk
+            num_frames = len(pending) // frame_bytes
+            if not num_frames:
+                continue
+            samples = np.frombuffer(bytes(pending[:num_frames * frame_bytes]), dtype=dtype)
+            del pending[:num_frames * frame_bytes]
+            hooks.stats.count("bytes_read", samples.nbytes)
+            if sample_bits == 24:
+                samples = wav_stream.Int24Samples(samples.reshape(-1, channels, 3), channels)
+            elif channels > 1:
+                samples = samples.reshape(-1, channels)
+            yield from scanner.feed(self._decode_frames(samples, 0, num_frames, hooks))
+
+
+class _StreamScanner:
+    """Finds and decodes payloads in the QIM bits of a stream, fed a whole
+    number of frames at a time (extract_stream). bits starts at a frame
+    boundary: while searching it holds less than a header's worth of
+    frames, once a payload has been found, that payload's bits."""
+
+    def __init__(self, engine, channels):
+        self.engine = engine
+        self.channels = channels
+        self.frame_bits = engine.bits_per_frame * channels
+        self.bits = np.zeros(0, dtype=np.uint8)
+        # (total bits, decode(bits) -> message) of the payload found
+        self.payload = None
+
+    def feed(self, bits):
+        """Consume more bits; return the messages they complete (BlockPayload
+        for a block-framed payload with corrupt blocks)."""
+        self.bits = np.concatenate([self.bits, bits])
+        messages = []
+        while self.payload is not None or self._find():
+            total, decode = self.payload
+            if len(self.bits) < total:
+                break
+            messages.append(decode(self.bits[:total]))
+            self._drop(self.engine._frames_for_bits(total, self.channels))
+            self.payload = None
+        return messages
+
+    def _drop(self, frames):
+        self.bits = self.bits[frames * self.frame_bits:]
+
+    def _find(self):
+        """Check each frame boundary for a payload start, dropping the frames
+        that do not open one. Sets payload and returns True once found."""
+        engine = self.engine
+        header_bits = engine._frames_for_bits(HEADER_BITS, self.channels) * self.frame_bits
+        while len(self.bits) >= header_bits:
+            raw = bits_to_bytes(self.bits[:HEADER_BITS])
+            if raw.startswith(HEADER_MAGIC):
+                try:
+                    length, flags = engine._parse_header(self.bits)
+                except ValueError:
+                    # Not a header for this engine, just bits that look like one
+                    self._drop(1)
+                    continue
+                self.payload = (HEADER_BITS + length * 8,
+                                lambda bits: engine._decode_message(bits_to_bytes(bits[HEADER_BITS:]), flags))
+                return True
+            if raw.startswith(BLOCK_SYNC):
+                found = self._find_blocks(raw)
+                if found is None:
+                    # Wait for the rest of the first block
+                    return False
+                if found:
+                    return True
+            self._drop(1)
+        return False
+
+    def _find_blocks(self, raw):
+        """Block container candidate at the start of bits: True if its first
+        block is intact (payload set), False if not, None if that block has
+        not fully arrived yet. Nothing is trusted before its CRC passes."""
+        engine = self.engine
+        _, _, flags, block_frames, seq, length, _ = _BLOCK_STRUCT.unpack(raw[:_BLOCK_STRUCT.size])
+        chunk = engine._block_chunk(block_frames, self.channels)
+        if seq != 0 or block_frames == 0 or chunk <= 0:
+            return False
+        block_bits = block_frames * self.frame_bits
+        n_blocks = max(-(-length // chunk), 1)
+        total = (n_blocks - 1) * block_bits + BLOCK_HEADER_BITS + (length - (n_blocks - 1) * chunk) * 8
+        if len(self.bits) < min(total, block_bits):
+            return None
+        if not engine._parse_block(self.bits[:block_bits], 0, block_frames, self.channels).valid:
+            return False
+
+        def decode(bits):
+            blocks = [engine._parse_block(bits[i * block_bits : (i + 1) * block_bits], i * block_frames,
+                                          block_frames, self.channels)
+                      for i in range(n_blocks)]
+            result = engine._assemble_blocks(blocks, chunk, length, flags)
+            return result if result.corrupt else result.message
+
+        self.payload = (total, decode)
+        return True
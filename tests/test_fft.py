@@ -0,0 +1,66 @@
+"""The FFT engine against its references, and legacy output against a
+stego sample written by the original (pre-optimization) implementation."""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wav_stream
+from steganography import FFTSteganography, _fft_recursive, manual_fft, manual_ifft, manual_irfft, manual_rfft
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# tests/data/legacy_stego.wav: tests/data/cover.wav with this message, embedded
+# by the baseline FFTSteganography() (terminator format, every frame
+# transformed)
+BASELINE_MESSAGE = "Baseline legacy payload"
+
+SIZES = (2, 4, 8, 64, 1024, 4096)
+
+
+def _signals(n, rows=3, seed=0):
+    rng = np.random.default_rng([seed, n])
+    return rng.standard_normal((rows, n)) + 1j * rng.standard_normal((rows, n))
+
+
+def test_manual_fft_is_bit_identical_to_recursive():
+    for n in SIZES:
+        x = _signals(n)
+        expected = np.array([_fft_recursive(row) for row in x])
+        assert np.array_equal(manual_fft(x), expected), n
+        assert np.array_equal(manual_fft(x[0]), expected[0]), n
+
+
+def test_manual_ifft_is_bit_identical_to_recursive():
+    for n in SIZES:
+        X = _signals(n, seed=1)
+        expected = np.array([np.conjugate(_fft_recursive(np.conjugate(row))) / n for row in X])
+        assert np.array_equal(manual_ifft(X), expected), n
+
+
+def test_manual_rfft_matches_numpy():
+    for n in SIZES:
+        x = _signals(n, seed=2).real
+        np.testing.assert_allclose(manual_rfft(x), np.fft.rfft(x), rtol=1e-10, atol=1e-10 * n)
+        np.testing.assert_allclose(manual_rfft(x.astype(np.float32)), np.fft.rfft(x), rtol=1e-4, atol=1e-4 * n)
+        np.testing.assert_allclose(manual_irfft(manual_rfft(x), n), x, atol=1e-12 * n)
+
+
+def test_legacy_baseline_sample():
+    cover = os.path.join(DATA, "cover.wav")
+    baseline = os.path.join(DATA, "legacy_stego.wav")
+    assert FFTSteganography().extract(baseline) == BASELINE_MESSAGE
+
+    engine = FFTSteganography(header=False)
+    assert engine.extract(baseline) == BASELINE_MESSAGE
+    stego = engine.embed_bytes(open(cover, "rb").read(), BASELINE_MESSAGE)
+    _, expected = wav_stream.open_wav(baseline)
+    _, samples = wav_stream.open_wav(stego)
+    # Payload frames are bit-identical; the baseline also sent every other
+    # frame through the FFT round trip and truncation, now copied through,
+    # which moves those samples by at most one LSB
+    payload = engine._frames_for_bits(len(engine._payload_bits(BASELINE_MESSAGE))) * engine.frame_size
+    assert np.array_equal(samples[:payload], expected[:payload])
+    assert np.abs(samples.astype(np.int32) - expected).max() <= 1
@@ -0,0 +1,12 @@
+"""Start-up budget of the headless entry points (see benchmark.py imports)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+def test_headless_entry_points_start_within_budget():
+    assert benchmark.check_imports(repeats=3) == 0
@@ -0,0 +1,301 @@
+"""
+Minimal streaming WAV I/O.
+
+Unlike scipy.io.wavfile, nothing here ever loads the sample data as a
+whole: the header is parsed on its own, samples are exposed through a
+read-only memory map, and output is written incrementally with the RIFF
+and data chunk sizes patched in when the file is closed.
+"""
+
+import io
+import mmap
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# sample_rate, channels, dtype (numpy, little-endian, as samples are exposed;
+# None if unsupported), n_samples (per channel), data_offset (bytes from start
+# of file to the first sample), sample_bits (as stored in the file)
+WavInfo = namedtuple("WavInfo", "sample_rate channels dtype n_samples data_offset sample_bits")
+
+# 24-bit PCM is exposed as int32, left-justified as scipy.io.wavfile does,
+# so it is normalized like 32-bit PCM
+_SAMPLE_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 24): np.dtype("<i4"),
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+}
+
+
+def _read_header(f):
+    """Parse the header from f's current position up to the first sample,
+    reading forward only (so f may be a pipe). Returns (fmt, offset of the
+    first sample from where f started, data chunk size)."""
+    header = f.read(12)
+    if len(header) < 12:
+        raise ValueError("Not a RIFF/WAVE file.")
+    riff, _, wave = struct.unpack("<4sI4s", header)
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file.")
+
+    offset = 12
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise ValueError("WAV file has no data chunk.")
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        offset += 8
+
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk precedes its fmt chunk.")
+            return fmt, offset, size
+
+        # Chunks are word-aligned
+        body = f.read(size + size % 2)
+        offset += len(body)
+        if chunk_id == b"fmt ":
+            format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                # The real format tag is the first two bytes of the SubFormat GUID
+                format_tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (format_tag, channels, sample_rate, block_align, bits)
+
+
+def read_wav_info(source, file_size=None):
+    """Parse only the header of a WAV file (path, binary file object or
+    bytes-like buffer). The sample data is never read. When source holds
+    only the start of the file (e.g. the head of an upload still arriving),
+    file_size gives the whole file's size."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if hasattr(source, "read"):
+        start = source.tell()
+        (format_tag, channels, sample_rate, block_align, bits), offset, size = _read_header(source)
+        source.seek(0, 2)
+        end = source.tell() - start
+        source.seek(start)
+    else:
+        with open(source, "rb") as f:
+            (format_tag, channels, sample_rate, block_align, bits), offset, size = _read_header(f)
+            f.seek(0, 2)
+            end = f.tell()
+    if file_size is None:
+        file_size = end
+
+    # None for formats open_wav cannot map; the header fields are still valid
+    dtype = _SAMPLE_DTYPES.get((format_tag, bits))
+
+    # A writer that never finalized its header leaves the size at 0 or 0xFFFFFFFF
+    available = file_size - offset
+    if size in (0, 0xFFFFFFFF) or size > available:
+        size = available
+    return WavInfo(sample_rate, channels, dtype, size // block_align, offset, bits)
+
+
+class Int24Samples:
+    """Read-only view of packed 24-bit PCM that behaves like the int32
+    array scipy.io.wavfile would return (samples shifted left by 8 bits).
+    Samples are only widened when sliced, so a memory-mapped file is still
+    read lazily, a slice at a time."""
+
+    dtype = np.dtype("<i4")
+
+    def __init__(self, packed, channels):
+        """:param packed: uint8 array of shape (n_samples, channels, 3)."""
+        self._packed = packed
+        self.shape = (len(packed),) if channels == 1 else (len(packed), channels)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def nbytes(self):
+        return self._packed.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        packed = self._packed[index]
+        wide = np.zeros(packed.shape[:-1] + (4,), dtype=np.uint8)
+        wide[..., 1:] = packed
+        samples = wide.view(self.dtype)[..., 0]
+        return samples if self.ndim > 1 else samples[..., 0]
+
+    def __array__(self, dtype=None, copy=None):
+        samples = self[:]
+        return samples if dtype is None else samples.astype(dtype)
+
+
+def read_stream_info(f):
+    """Parse the header of a WAV stream that may not be seekable (a pipe,
+    stdin, a file still being written), leaving f at the first sample.
+    n_samples is None: the data chunk size of a live stream means nothing."""
+    (format_tag, channels, sample_rate, _, bits), offset, _ = _read_header(f)
+    return WavInfo(sample_rate, channels, _SAMPLE_DTYPES.get((format_tag, bits)), None, offset, bits)
+
+
+def read_chunks(f, size=1 << 16, follow=False, poll=0.1):
+    """Yield the bytes of a binary file object as they become available,
+    in chunks of up to size bytes; reads return as soon as anything has
+    arrived (read1), so a pipe is passed on without waiting to fill a chunk.
+
+    At the end of the file the generator stops, unless follow is set: then
+    the end only means the writer has not caught up, and f is polled every
+    poll seconds until the caller stops iterating (like tail -f).
+    """
+    read = getattr(f, "read1", f.read)
+    while True:
+        chunk = read(size)
+        if chunk:
+            yield chunk
+        elif follow:
+            time.sleep(poll)
+        else:
+            return
+
+
+def open_wav(source):
+    """Open a WAV file's samples without loading them eagerly. Returns
+    (WavInfo, samples), where samples has shape (n_samples,) for mono or
+    (n_samples, channels) otherwise. 24-bit samples come as an Int24Samples
+    view, widened to int32 a slice at a time.
+
+    A path is memory-mapped read-only, so pages are only read when touched.
+    A bytes-like buffer, or an io.BytesIO (through getbuffer()), is viewed
+    in place without copying; any other binary file object is read from its
+    current position.
+    """
+    info = read_wav_info(source)
+    if info.dtype is None:
+        raise ValueError("Unsupported WAV sample format.")
+    shape = (info.n_samples,) if info.channels == 1 else (info.n_samples, info.channels)
+    if info.n_samples == 0:
+        return info, np.zeros(shape, dtype=info.dtype)
+
+    dtype = info.dtype
+    if info.sample_bits == 24:
+        dtype, shape = np.dtype("u1"), (info.n_samples, info.channels, 3)
+    count = int(np.prod(shape))
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = np.frombuffer(source, dtype=dtype, count=count, offset=info.data_offset).reshape(shape)
+    elif not hasattr(source, "read"):
+        data = np.memmap(source, dtype=dtype, mode="r", offset=info.data_offset, shape=shape)
+    elif hasattr(source, "getbuffer"):
+        data = np.frombuffer(source.getbuffer(), dtype=dtype, count=count,
+                             offset=source.tell() + info.data_offset).reshape(shape)
+    else:
+        start = source.tell()
+        source.seek(start + info.data_offset)
+        raw = source.read(count * dtype.itemsize)
+        source.seek(start)
+        data = np.frombuffer(raw, dtype=dtype, count=count).reshape(shape)
+
+    if info.sample_bits == 24:
+        data = Int24Samples(data, info.channels)
+    return info, data
+
+
+def release(samples, stop):
+    """Drop the pages holding samples [0, stop) of open_wav() samples from
+    the process's resident set, so a front-to-back pass over a memory-mapped
+    file keeps memory flat. Everything before stop is released each time,
+    not just the latest range: a page fault may map a whole (large) page
+    cache folio, reaching back over pages released earlier. The mapping is
+    read-only and file-backed, so this is always safe: touched again, the
+    pages are simply read back from the file. A no-op for samples that are
+    not memory-mapped, or where madvise is unavailable."""
+    if isinstance(samples, Int24Samples):
+        samples = samples._packed
+    mapping = getattr(samples, "_mmap", None)
+    if mapping is None or not hasattr(mapping, "madvise"):
+        return
+    offset = samples.ctypes.data - np.frombuffer(mapping, dtype=np.uint8).ctypes.data
+    end = min(offset + stop * samples.strides[0], len(mapping))
+    if end > 0:
+        mapping.madvise(mmap.MADV_DONTNEED, 0, end)
+
+
+class WavWriter:
+    """Incremental WAV writer.
+
+    A header with placeholder sizes is written up front; write() appends
+    sample blocks as they are produced, and close() patches the RIFF and
+    data chunk sizes. Accepts a path or a seekable binary file object (which
+    is left open).
+
+    sample_bits=24 with int32 samples (left-justified, as open_wav reads
+    them) writes packed 24-bit PCM, rounding off the low byte.
+    """
+
+    def __init__(self, target, sample_rate, channels, dtype, sample_bits=None):
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype.kind == "f":
+            format_tag = WAVE_FORMAT_IEEE_FLOAT
+        elif self.dtype.kind in "iu":
+            format_tag = WAVE_FORMAT_PCM
+        else:
+            raise ValueError(f"Cannot write {dtype} samples to WAV.")
+        self.sample_bits = sample_bits or self.dtype.itemsize * 8
+        if self.sample_bits != self.dtype.itemsize * 8 and (self.sample_bits, self.dtype.str) != (24, "<i4"):
+            raise ValueError(f"Cannot write {dtype} samples as {sample_bits}-bit WAV.")
+
+        self.channels = channels
+        self._owns_file = not hasattr(target, "write")
+        self._f = open(target, "wb") if self._owns_file else target
+        self._start = self._f.tell()
+        self._data_bytes = 0
+
+        block_align = channels * self.sample_bits // 8
+        self._f.write(struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 0, b"WAVE",
+            b"fmt ", 16, format_tag, channels, sample_rate,
+            sample_rate * block_align, block_align, self.sample_bits,
+            b"data", 0))
+
+    def write(self, samples):
+        """Append a block of samples, shaped (n,) or (n, channels)."""
+        block = np.ascontiguousarray(samples, dtype=self.dtype)
+        if self.sample_bits == 24:
+            # Round to the nearest 24-bit value, then keep the low three
+            # bytes of each little-endian int32
+            wide = np.clip((block.astype(np.int64) + 0x80) >> 8, -(1 << 23), (1 << 23) - 1)
+            block = wide.astype("<i4").reshape(-1, 1).view(np.uint8)[:, :3]
+        self._f.write(block.tobytes())
+        self._data_bytes += block.nbytes
+
+    def close(self):
+        if self._f is None:
+            return
+        if self._data_bytes % 2:
+            self._f.write(b"\0")
+        end = self._f.tell()
+        self._f.seek(self._start + 4)
+        self._f.write(struct.pack("<I", 36 + self._data_bytes + self._data_bytes % 2))
+        self._f.seek(self._start + 40)
+        self._f.write(struct.pack("<I", self._data_bytes))
+        self._f.seek(end)
+        if self._owns_file:
+            self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()